@@ -11,6 +11,8 @@ from alembic import context
 from app.config import get_database_url
 from app.models.base import Base
 from app.models.api_key import ApiKey  # noqa: F401 - register with metadata
+from app.models.rate_limit_policy import RateLimitPolicy  # noqa: F401 - register with metadata
+from app.models.usage_record import UsageRecord  # noqa: F401 - register with metadata
 
 config = context.config
 
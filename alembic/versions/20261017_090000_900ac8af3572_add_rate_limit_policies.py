@@ -0,0 +1,42 @@
+"""add rate_limit_policies
+
+Revision ID: 900ac8af3572
+Revises: 9c25349797c5
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '900ac8af3572'
+down_revision: Union[str, None] = '9c25349797c5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('rate_limit_policies',
+    sa.Column('id', sa.UUID(), server_default=sa.text('gen_random_uuid()'), nullable=False),
+    sa.Column('tenant_id', sa.UUID(), nullable=True),
+    sa.Column('api_key_id', sa.UUID(), nullable=True),
+    sa.Column('requests_per_min', sa.Integer(), nullable=False),
+    sa.Column('burst', sa.Integer(), nullable=True),
+    sa.Column('max_concurrency', sa.Integer(), nullable=True),
+    sa.Column('mode', sa.String(length=16), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.CheckConstraint('(tenant_id IS NULL) <> (api_key_id IS NULL)', name='ck_rate_limit_policies_one_subject'),
+    sa.ForeignKeyConstraint(['api_key_id'], ['api_keys.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('api_key_id'),
+    sa.UniqueConstraint('tenant_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('rate_limit_policies')
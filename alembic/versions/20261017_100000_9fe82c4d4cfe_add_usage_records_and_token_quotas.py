@@ -0,0 +1,37 @@
+"""add usage_records and token quotas
+
+Revision ID: 9fe82c4d4cfe
+Revises: 900ac8af3572
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9fe82c4d4cfe'
+down_revision: Union[str, None] = '900ac8af3572'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('usage_records',
+    sa.Column('tenant_id', sa.UUID(), nullable=False),
+    sa.Column('model', sa.String(length=255), nullable=False),
+    sa.Column('period_start', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('requests', sa.BigInteger(), nullable=False),
+    sa.Column('prompt_tokens', sa.BigInteger(), nullable=False),
+    sa.Column('completion_tokens', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('tenant_id', 'model', 'period_start')
+    )
+    op.add_column('rate_limit_policies', sa.Column('tokens_per_min', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('rate_limit_policies', 'tokens_per_min')
+    op.drop_table('usage_records')
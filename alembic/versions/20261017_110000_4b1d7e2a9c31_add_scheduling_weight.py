@@ -0,0 +1,26 @@
+"""add scheduling_weight to rate_limit_policies
+
+Revision ID: 4b1d7e2a9c31
+Revises: 9fe82c4d4cfe
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b1d7e2a9c31'
+down_revision: Union[str, None] = '9fe82c4d4cfe'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('rate_limit_policies', sa.Column('scheduling_weight', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('rate_limit_policies', 'scheduling_weight')
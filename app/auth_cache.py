@@ -0,0 +1,118 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+import structlog
+
+from app.config import (
+    AUTH_CACHE_MAX_ENTRIES,
+    AUTH_CACHE_TTL_SECONDS,
+    AUTH_CACHE_NEGATIVE_TTL_SECONDS,
+    AUTH_INVALIDATION_CHANNEL,
+)
+from app.metrics import AUTH_CACHE_LOOKUPS, AUTH_CACHE_INVALIDATIONS
+from app.redis import redis_client
+
+logger = structlog.get_logger()
+
+# Sentinel stored for hashes that did not resolve to an active key.
+_NEGATIVE = object()
+
+
+class AuthCache:
+    """Bounded LRU + TTL cache of key_hash -> AuthContext.
+
+    Negative results are cached with a shorter TTL so unknown keys cannot
+    hammer Postgres. Entries are dropped explicitly via `invalidate` when a
+    key is deactivated (see `listen_for_invalidations`).
+    """
+
+    def __init__(
+            self,
+            max_entries: int = AUTH_CACHE_MAX_ENTRIES,
+            ttl_seconds: float = AUTH_CACHE_TTL_SECONDS,
+            negative_ttl_seconds: float = AUTH_CACHE_NEGATIVE_TTL_SECONDS,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, object]] = OrderedDict()
+
+    def get(self, key_hash: str):
+        """Return (found, auth_context). auth_context is None for a cached negative."""
+        entry = self._entries.get(key_hash)
+        if entry is None:
+            AUTH_CACHE_LOOKUPS.labels(result="miss").inc()
+            return False, None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key_hash]
+            AUTH_CACHE_LOOKUPS.labels(result="expired").inc()
+            return False, None
+
+        self._entries.move_to_end(key_hash)
+        if value is _NEGATIVE:
+            AUTH_CACHE_LOOKUPS.labels(result="negative_hit").inc()
+            return True, None
+
+        AUTH_CACHE_LOOKUPS.labels(result="hit").inc()
+        return True, value
+
+    def set(self, key_hash: str, auth_context):
+        self._put(key_hash, auth_context, self.ttl_seconds)
+
+    def set_negative(self, key_hash: str):
+        self._put(key_hash, _NEGATIVE, self.negative_ttl_seconds)
+
+    def invalidate(self, key_hash: str):
+        self._entries.pop(key_hash, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _put(self, key_hash: str, value, ttl: float):
+        self._entries[key_hash] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key_hash)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+auth_cache = AuthCache()
+
+
+async def publish_invalidation(key_hash: str):
+    """Tell every gateway node to drop `key_hash` from its auth cache."""
+    auth_cache.invalidate(key_hash)
+    await redis_client.publish(AUTH_INVALIDATION_CHANNEL, key_hash)
+
+
+async def listen_for_invalidations():
+    """Background task: apply invalidations published by other nodes.
+
+    Whenever the subscription drops we may have missed messages, so the
+    whole cache is cleared before resubscribing.
+    """
+    while True:
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.subscribe(AUTH_INVALIDATION_CHANNEL)
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                auth_cache.invalidate(message["data"])
+                AUTH_CACHE_INVALIDATIONS.inc()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("auth_invalidation_listener_error", error=str(e))
+            auth_cache.clear()
+            await asyncio.sleep(1)
+        finally:
+            try:
+                await pubsub.reset()
+            except Exception:
+                pass
@@ -1,6 +1,32 @@
+import asyncio
+import math
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) when the provider reports none."""
+    return math.ceil(len(text) / 4) if text else 0
+
+class Usage:
+    def __init__(self, prompt_tokens: int = 0, completion_tokens: int = 0, estimated: bool = False):
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.estimated = estimated
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    @classmethod
+    def estimate(cls, prompt: str, output: str) -> "Usage":
+        return cls(estimate_tokens(prompt), estimate_tokens(output), estimated=True)
 
 class InferenceBackend(ABC):
+    @property
+    def name(self) -> str:
+        """Name reported in responses and cache entries."""
+        return self.__class__.__name__
+
     @abstractmethod
     async def predict(
         self,
@@ -10,4 +36,66 @@ class InferenceBackend(ABC):
         max_tokens: int,
         ) -> str:
         pass
-    
\ No newline at end of file
+
+    async def predict_with_usage(
+        self,
+        prompt: str,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        ) -> tuple[str, Usage]:
+        """Like predict, plus token usage.
+
+        Backends whose provider reports usage override this; the default
+        estimates it from the prompt and output lengths.
+        """
+        output = await self.predict(
+            prompt=prompt,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+        return output, Usage.estimate(prompt, output)
+
+    async def predict_batch(
+        self,
+        prompts: list[str],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        ) -> list[str]:
+        """Run several prompts with the same parameters, outputs in prompt order.
+
+        Backends that can share one forward pass across prompts override
+        this; the default just runs them concurrently.
+        """
+        return await asyncio.gather(*(
+            self.predict(prompt=prompt, model=model, temperature=temperature, max_tokens=max_tokens)
+            for prompt in prompts
+        ))
+
+    async def warm_up(self, connections: int):
+        """Open upstream connections ahead of the first request; no-op by default."""
+        return None
+
+    async def predict_stream(
+        self,
+        prompt: str,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        ) -> AsyncIterator[str | Usage]:
+        """Yield output chunks as they are generated.
+
+        A stream may end with the provider's token usage as a final Usage
+        item; without one, usage is estimated from the output. Backends
+        without native streaming emit the full output as one chunk.
+        """
+        output, usage = await self.predict_with_usage(
+            prompt=prompt,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+        yield output
+        yield usage
@@ -0,0 +1,112 @@
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+
+import structlog
+
+from app.metrics import BATCH_SIZE, BATCH_QUEUE_DELAY
+
+logger = structlog.get_logger()
+
+# How long a per-model worker stays around with nothing queued
+_IDLE_SECONDS = 30
+
+RunBatch = Callable[[list[str], str, float, int], Awaitable[list[str]]]
+
+
+class _Pending:
+    __slots__ = ("prompt", "future", "enqueued_at")
+
+    def __init__(self, prompt: str, future: asyncio.Future):
+        self.prompt = prompt
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """Collects concurrent predictions into batches for `run_batch`.
+
+    Requests are grouped by (model, temperature, max_tokens), since one
+    batch shares its sampling parameters. A batch is dispatched as soon as
+    it holds `max_batch_size` prompts or its first prompt has waited
+    `max_wait_seconds`. Each group has one worker, so batches for a model
+    run one at a time, like forward passes on a single model server; the
+    next batch fills up while the current one runs.
+    """
+
+    def __init__(self, run_batch: RunBatch, max_batch_size: int, max_wait_seconds: float, name: str):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_seconds = max_wait_seconds
+        self.name = name
+        self._queues: dict[tuple, asyncio.Queue] = {}
+        self._workers: dict[tuple, asyncio.Task] = {}
+
+    async def submit(self, prompt: str, model: str, temperature: float, max_tokens: int) -> str:
+        key = (model, temperature, max_tokens)
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = asyncio.Queue()
+        pending = _Pending(prompt, asyncio.get_running_loop().create_future())
+        queue.put_nowait(pending)
+        if key not in self._workers:
+            self._workers[key] = asyncio.create_task(self._work(key, queue))
+        return await pending.future
+
+    async def _work(self, key: tuple, queue: asyncio.Queue):
+        try:
+            while True:
+                try:
+                    first = await asyncio.wait_for(queue.get(), _IDLE_SECONDS)
+                except asyncio.TimeoutError:
+                    if queue.empty():
+                        return
+                    continue
+                batch = [first]
+                deadline = first.enqueued_at + self.max_wait_seconds
+                while len(batch) < self.max_batch_size:
+                    if not queue.empty():
+                        batch.append(queue.get_nowait())
+                        continue
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                await self._dispatch(key, batch)
+        finally:
+            del self._workers[key]
+            del self._queues[key]
+            # Callers still queued when the worker is cancelled must not hang
+            while not queue.empty():
+                pending = queue.get_nowait()
+                if not pending.future.done():
+                    pending.future.cancel()
+
+    async def _dispatch(self, key: tuple, batch: list[_Pending]):
+        # Callers that gave up while queued don't need a slot in the batch
+        batch = [p for p in batch if not p.future.done()]
+        if not batch:
+            return
+        now = time.perf_counter()
+        for pending in batch:
+            BATCH_QUEUE_DELAY.labels(backend=self.name).observe(now - pending.enqueued_at)
+        BATCH_SIZE.labels(backend=self.name).observe(len(batch))
+
+        model, temperature, max_tokens = key
+        try:
+            outputs = await self.run_batch([p.prompt for p in batch], model, temperature, max_tokens)
+            if len(outputs) != len(batch):
+                raise RuntimeError(f"{self.name} returned {len(outputs)} outputs for {len(batch)} prompts")
+        except Exception as e:
+            logger.warning("batch_failed", backend=self.name, model=model, size=len(batch), error=str(e))
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+
+        for pending, output in zip(batch, outputs):
+            if not pending.future.done():
+                pending.future.set_result(output)
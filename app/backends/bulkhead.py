@@ -0,0 +1,110 @@
+import asyncio
+
+from fastapi import HTTPException, status
+
+from app import deadline
+from app.backends.scheduler import FairQueue
+from app.config import BULKHEAD_MAX_QUEUE_PER_TENANT
+from app.metrics import BULKHEAD_IN_FLIGHT, BULKHEAD_QUEUED, BULKHEAD_REJECTIONS
+from app.timing import stage
+
+
+class Bulkhead:
+    """Caps concurrent calls to one provider, with a bounded wait queue.
+
+    A call that finds every slot busy waits in the queue for at most
+    `queue_timeout` seconds (less if its deadline is closer); when the queue itself is full it is shed at
+    once. Both cases raise a 503 with Retry-After, so a slow provider costs
+    bounded memory and sockets instead of an ever-growing pile of coroutines.
+
+    Freed slots go to waiters in weighted fair order across tenants (see
+    app/backends/scheduler.py), and no tenant may hold more than
+    `max_queue_per_tenant` of the queue, so one tenant's flood cannot crowd
+    everyone else out of the provider.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float, max_queue_per_tenant: int = BULKHEAD_MAX_QUEUE_PER_TENANT):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._queue = FairQueue(name, max_per_tenant=max_queue_per_tenant)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+    def slot(self, tenant: str | None = None, weight: float = 1.0) -> "_Slot":
+        """`async with bulkhead.slot(tenant, weight):` queues under `tenant`."""
+        return _Slot(self, tenant, weight)
+
+    def has_capacity(self) -> bool:
+        """Whether a call arriving now would get a slot without queueing."""
+        return self.in_flight < self.max_concurrent and not len(self._queue)
+
+    async def acquire(self, tenant: str | None = None, weight: float = 1.0):
+        if self.has_capacity():
+            self._set_in_flight(self.in_flight + 1)
+            return
+
+        tenant = str(tenant) if tenant is not None else "-"
+        if len(self._queue) >= self.max_queue:
+            raise self._shed("queue_full")
+        if self._queue.depth(tenant) >= self._queue.max_per_tenant:
+            raise self._shed("tenant_queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queue.push(tenant, waiter, weight)
+        BULKHEAD_QUEUED.labels(provider=self.name).set(len(self._queue))
+        try:
+            # release() hands its slot straight to us, in_flight unchanged
+            with stage("queue_wait"):
+                await asyncio.wait_for(asyncio.shield(waiter), timeout=deadline.budget(self.queue_timeout))
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # Got the slot just as we gave up: pass it on
+                self.release()
+            else:
+                self._queue.discard(tenant, waiter)
+                BULKHEAD_QUEUED.labels(provider=self.name).set(len(self._queue))
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._shed("queue_timeout")
+            raise
+
+    def release(self):
+        waiter = self._queue.pop()
+        BULKHEAD_QUEUED.labels(provider=self.name).set(len(self._queue))
+        if waiter is not None:
+            waiter.set_result(None)
+            return
+        self._set_in_flight(self.in_flight - 1)
+
+    def _set_in_flight(self, value: int):
+        self.in_flight = value
+        BULKHEAD_IN_FLIGHT.labels(provider=self.name).set(value)
+
+    def _shed(self, reason: str) -> HTTPException:
+        BULKHEAD_REJECTIONS.labels(provider=self.name, reason=reason).inc()
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"{self.name} backend overloaded",
+            headers={"Retry-After": str(max(1, round(self.queue_timeout)))},
+        )
+
+
+class _Slot:
+    def __init__(self, bulkhead: Bulkhead, tenant: str | None, weight: float):
+        self._bulkhead = bulkhead
+        self._tenant = tenant
+        self._weight = weight
+
+    async def __aenter__(self):
+        await self._bulkhead.acquire(self._tenant, self._weight)
+        return self._bulkhead
+
+    async def __aexit__(self, *exc_info):
+        self._bulkhead.release()
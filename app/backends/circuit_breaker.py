@@ -1,43 +1,234 @@
-import time 
+import asyncio
+import time
+import uuid
+from collections import deque
 from enum import Enum
 
+import structlog
+
+from app.config import (
+    CIRCUIT_BREAKER_FAILURE_RATE,
+    CIRCUIT_BREAKER_WINDOW_SECONDS,
+    CIRCUIT_BREAKER_HALF_OPEN_PROBES,
+    CIRCUIT_BREAKER_SHARED,
+    CIRCUIT_BREAKER_CHANNEL,
+)
+from app.metrics import CIRCUIT_STATE, CIRCUIT_TRANSITIONS
+from app.redis import redis_client
+
+logger = structlog.get_logger()
+
+_NODE_ID = uuid.uuid4().hex
+# Keep references so fire-and-forget publishes aren't garbage collected
+_publish_tasks: set[asyncio.Task] = set()
+# Shared breakers by name, for applying transitions from other workers
+_shared_breakers: dict[str, "CircuitBreaker"] = {}
+
 class CircuitState(str, Enum):
     CLOSED = "closed"
     OPEN = "open"
+    HALF_OPEN = "half_open"
+
+_STATE_VALUES = {CircuitState.CLOSED: 0, CircuitState.HALF_OPEN: 1, CircuitState.OPEN: 2}
 
 class CircuitBreaker:
+    """Failure-rate circuit breaker for one provider.
+
+    CLOSED: calls pass; outcomes are counted in 1s buckets over the last
+    `window_seconds`, and once at least `min_requests` calls have been seen
+    a failure rate of `failure_rate_threshold` or more opens the circuit.
+    OPEN: calls are rejected for `cooldown_seconds`.
+    HALF_OPEN: up to `half_open_max_probes` calls are let through; if they
+    all succeed the circuit closes, any failure reopens it.
+
+    With `shared`, transitions are broadcast over Redis so every worker
+    and node trips (and recovers) together.
+    """
+
     def  __init__(
-            self, 
-            failure_threshold: int = 5,
+            self,
+            name: str,
+            min_requests: int = 5,
             cooldown_seconds: int = 30,
+            failure_rate_threshold: float = CIRCUIT_BREAKER_FAILURE_RATE,
+            window_seconds: int = CIRCUIT_BREAKER_WINDOW_SECONDS,
+            half_open_max_probes: int = CIRCUIT_BREAKER_HALF_OPEN_PROBES,
+            shared: bool = CIRCUIT_BREAKER_SHARED,
     ):
-        self.failure_threshold = failure_threshold
+        self.name = name
+        self.min_requests = min_requests
         self.cooldown_seconds = cooldown_seconds
-        self.failure_count = 0
-        self.last_failure_time = None
+        self.failure_rate_threshold = failure_rate_threshold
+        self.window_seconds = window_seconds
+        self.half_open_max_probes = half_open_max_probes
+        self.shared = shared
         self.state = CircuitState.CLOSED
-    
-    def allow_request(self)-> bool: 
+        self.opened_at = None
+        # [second, successes, failures], oldest first
+        self._buckets: deque[list[int]] = deque()
+        self._probes_sent = 0
+        self._probes_ok = 0
+        self._last_probe_at = 0.0
+        CIRCUIT_STATE.labels(provider=name).set(0)
+        if shared:
+            _shared_breakers[name] = self
+
+    def is_available(self) -> bool:
+        """Whether allow_request() would admit a call, without taking a probe."""
         if self.state == CircuitState.CLOSED:
             return True
-        
-        if self.last_failure_time is None:
-            return False
-        
-        if time.time() - self.last_failure_time > self.cooldown_seconds:
+        now = time.time()
+        if self.state == CircuitState.OPEN:
+            return now - self.opened_at >= self.cooldown_seconds
+        return self._probes_sent < self.half_open_max_probes or now - self._last_probe_at >= self.cooldown_seconds
+
+    def allow_request(self)-> bool:
+        """Admit one call. In HALF_OPEN this takes a probe slot, so call it
+        only as the call starts; its outcome, or release_probe(), settles it."""
+        if self.state == CircuitState.CLOSED:
             return True
-        
-        return False
-    
+
+        now = time.time()
+        if self.state == CircuitState.OPEN:
+            if now - self.opened_at < self.cooldown_seconds:
+                return False
+            self._transition(CircuitState.HALF_OPEN)
+
+        # A probe that never reported back (cancelled, or lost) must not
+        # wedge the breaker half-open forever
+        if self._probes_sent >= self.half_open_max_probes and now - self._last_probe_at < self.cooldown_seconds:
+            return False
+        self._probes_sent += 1
+        self._last_probe_at = now
+        return True
+
+    def release_probe(self):
+        """Hand back the probe slot of a call that ended without an outcome."""
+        if self.state == CircuitState.HALF_OPEN and self._probes_sent > 0:
+            self._probes_sent -= 1
+
     def record_success(self):
-        self.failure_count = 0
-        self.state = CircuitState.CLOSED
-    
+        if self.state == CircuitState.HALF_OPEN:
+            self._probes_ok += 1
+            if self._probes_ok >= self.half_open_max_probes:
+                self._transition(CircuitState.CLOSED)
+            return
+        if self.state == CircuitState.CLOSED:
+            self._bucket()[1] += 1
+
     def record_failure(self):
-        self.failure_count += 1
-        self.last_failure_time = time.time()
-        if self.failure_count >= self.failure_threshold:
-            self.state = CircuitState.OPEN
-            
-        
+        if self.state == CircuitState.HALF_OPEN:
+            self._transition(CircuitState.OPEN)
+            return
+        if self.state != CircuitState.CLOSED:
+            return
+
+        self._bucket()[2] += 1
+        successes = sum(b[1] for b in self._buckets)
+        failures = sum(b[2] for b in self._buckets)
+        total = successes + failures
+        if total >= self.min_requests and failures / total >= self.failure_rate_threshold:
+            self._transition(CircuitState.OPEN)
+
+    def failure_rate(self) -> float:
+        self._expire(int(time.time()))
+        total = sum(b[1] + b[2] for b in self._buckets)
+        return sum(b[2] for b in self._buckets) / total if total else 0.0
+
+    def _bucket(self) -> list[int]:
+        second = int(time.time())
+        self._expire(second)
+        if not self._buckets or self._buckets[-1][0] != second:
+            self._buckets.append([second, 0, 0])
+        return self._buckets[-1]
+
+    def _expire(self, second: int):
+        while self._buckets and self._buckets[0][0] <= second - self.window_seconds:
+            self._buckets.popleft()
+
+    def _transition(self, state: CircuitState, opened_at: float | None = None, broadcast: bool = True):
+        if state == self.state:
+            return
+        logger.warning("circuit_state_change", provider=self.name, old=self.state.value, new=state.value)
+        self.state = state
+        self._probes_sent = self._probes_ok = 0
+        if state == CircuitState.OPEN:
+            self.opened_at = opened_at or time.time()
+        elif state == CircuitState.CLOSED:
+            self._buckets.clear()
+        CIRCUIT_STATE.labels(provider=self.name).set(_STATE_VALUES[state])
+        CIRCUIT_TRANSITIONS.labels(provider=self.name, state=state.value).inc()
+
+        # HALF_OPEN is reached locally by every node once cooldown passes
+        if broadcast and self.shared and state != CircuitState.HALF_OPEN:
+            try:
+                task = asyncio.get_running_loop().create_task(_publish_state(self))
+            except RuntimeError:
+                return
+            _publish_tasks.add(task)
+            task.add_done_callback(_publish_tasks.discard)
+
+    def apply_remote(self, state: str, opened_at: float):
+        """Adopt a transition another worker published."""
+        state = CircuitState(state)
+        if state == CircuitState.OPEN and self.state == CircuitState.OPEN:
+            self.opened_at = max(self.opened_at, opened_at)
+            return
+        self._transition(state, opened_at=opened_at, broadcast=False)
+
+
+def _state_key(name: str) -> str:
+    # One hash tag for all breakers, so the listener's MGET works on Cluster
+    return f"{{circuit}}:{name}"
+
+
+async def _publish_state(breaker: CircuitBreaker):
+    # The name goes last: it is the only field that may contain spaces
+    message = f"{_NODE_ID} {breaker.state.value} {breaker.opened_at or 0} {breaker.name}"
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            if breaker.state == CircuitState.OPEN:
+                # Lets workers that start (or resubscribe) later catch up
+                pipe.set(_state_key(breaker.name), message, ex=max(1, int(breaker.cooldown_seconds)))
+            else:
+                pipe.delete(_state_key(breaker.name))
+            pipe.publish(CIRCUIT_BREAKER_CHANNEL, message)
+            await pipe.execute()
+    except Exception as e:
+        logger.warning("circuit_publish_failed", provider=breaker.name, error=str(e))
+
+
+def _apply_message(message: str):
+    node_id, state, opened_at, name = message.split(" ", 3)
+    breaker = _shared_breakers.get(name)
+    if node_id != _NODE_ID and breaker is not None:
+        breaker.apply_remote(state, float(opened_at))
+
 
+async def listen_for_breaker_changes():
+    """Background task: apply circuit transitions published by other workers."""
+    if not CIRCUIT_BREAKER_SHARED:
+        return
+    while True:
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.subscribe(CIRCUIT_BREAKER_CHANNEL)
+            # Circuits opened while we weren't listening
+            names = list(_shared_breakers)
+            if names:
+                for message in await redis_client.mget([_state_key(name) for name in names]):
+                    if message:
+                        _apply_message(message)
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    _apply_message(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("circuit_listener_error", error=str(e))
+            await asyncio.sleep(1)
+        finally:
+            try:
+                await pubsub.reset()
+            except Exception:
+                pass
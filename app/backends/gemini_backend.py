@@ -1,13 +1,28 @@
 import os
+from collections.abc import AsyncIterator
+import structlog
 from google import genai
-from app.backends.base import InferenceBackend
+from google.genai import types
+from app.backends.base import InferenceBackend, Usage
+from app.backends.transport import http_client, prewarm
+
+logger = structlog.get_logger()
+
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/"
 
 class GeminiBackend(InferenceBackend):
-    def __init__(self):
-        self.api_key = os.getenv("GEMINI_API_KEY")
+    def __init__(self, api_key_env: str = "GEMINI_API_KEY"):
+        self.api_key = os.getenv(api_key_env)
         if not self.api_key:
-            raise ValueError("GEMINI_API_KEY not set")
-        self.client = genai.Client()
+            raise ValueError(f"{api_key_env} not set")
+        # The provider's shared connection pool (see app/backends/transport.py)
+        self.client = genai.Client(
+            api_key=self.api_key,
+            http_options=types.HttpOptions(httpx_async_client=http_client("gemini")),
+        )
+
+    async def warm_up(self, connections: int):
+        await prewarm("gemini", GEMINI_BASE_URL, connections)
 
     async def predict(
             self,
@@ -16,14 +31,56 @@ class GeminiBackend(InferenceBackend):
             temperature: float,
             max_tokens: int
     ) -> str:
+        output, _ = await self.predict_with_usage(prompt, model, temperature, max_tokens)
+        return output
+
+    async def predict_with_usage(
+            self,
+            prompt: str,
+            model: str,
+            temperature: float,
+            max_tokens: int
+    ) -> tuple[str, Usage]:
         try:
             response = await self.client.aio.models.generate_content(
                 model=model,
                 contents=prompt,
             )
         except Exception as e:
-            # log error
-            print(f"Gemini API error: {e}")
+            logger.warning("provider_api_error", provider="gemini", model=model, error=str(e))
             raise
 
-        return str(response.text)
+        output = str(response.text)
+        metadata = response.usage_metadata
+        if metadata is None or metadata.prompt_token_count is None:
+            return output, Usage.estimate(prompt, output)
+        return output, Usage(metadata.prompt_token_count, metadata.candidates_token_count or 0)
+
+    async def predict_stream(
+            self,
+            prompt: str,
+            model: str,
+            temperature: float,
+            max_tokens: int
+    ) -> AsyncIterator[str | Usage]:
+        try:
+            stream = await self.client.aio.models.generate_content_stream(
+                model=model,
+                contents=prompt,
+            )
+        except Exception as e:
+            logger.warning("provider_api_error", provider="gemini", model=model, error=str(e))
+            raise
+
+        metadata = None
+        try:
+            async for chunk in stream:
+                if chunk.text:
+                    yield chunk.text
+                # Each chunk reports the usage so far; the last one is the total
+                metadata = chunk.usage_metadata or metadata
+        finally:
+            # Frees the connection if the caller stops early
+            await stream.aclose()
+        if metadata is not None and metadata.prompt_token_count is not None:
+            yield Usage(metadata.prompt_token_count, metadata.candidates_token_count or 0)
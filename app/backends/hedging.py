@@ -0,0 +1,128 @@
+import asyncio
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+
+from app.config import (
+    HEDGING_ENABLED,
+    HEDGE_PERCENTILE,
+    HEDGE_BUDGET_FRACTION,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_MIN_DELAY_MS,
+)
+from app.metrics import HEDGE_REQUESTS, HEDGE_WINS
+
+# Latency samples kept per backend, and how often the percentile is recomputed
+_WINDOW = 1000
+_RECOMPUTE_EVERY = 50
+
+
+class LatencyTracker:
+    """Recent successful call latencies per backend, for the hedge delay."""
+
+    def __init__(self, window: int = _WINDOW):
+        self.window = window
+        self._samples: dict[str, deque] = {}
+        # name -> (samples since last recompute, last computed percentile)
+        self._cached: dict[str, tuple[int, float | None]] = {}
+
+    def record(self, name: str, seconds: float):
+        samples = self._samples.get(name)
+        if samples is None:
+            samples = self._samples[name] = deque(maxlen=self.window)
+        samples.append(seconds)
+        stale, value = self._cached.get(name, (0, None))
+        self._cached[name] = (stale + 1, value)
+
+    def percentile(self, name: str, pct: float, min_samples: int = HEDGE_MIN_SAMPLES) -> float | None:
+        """The `pct` percentile latency, or None with too few samples."""
+        samples = self._samples.get(name)
+        if samples is None or len(samples) < min_samples:
+            return None
+        stale, value = self._cached[name]
+        # Sorting the window on every call would cost more than the hedge saves
+        if value is None or stale >= _RECOMPUTE_EVERY:
+            ordered = sorted(samples)
+            value = ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+            self._cached[name] = (0, value)
+        return value
+
+
+class HedgeBudget:
+    """Allows hedges for at most `fraction` of calls.
+
+    Every call earns `fraction` of a credit and a hedge spends one, so
+    bursts of slow calls can't double provider load.
+    """
+
+    def __init__(self, fraction: float = HEDGE_BUDGET_FRACTION, max_credits: float = 10.0):
+        self.fraction = fraction
+        self.max_credits = max_credits
+        self.credits = 0.0
+
+    def earn(self):
+        self.credits = min(self.max_credits, self.credits + self.fraction)
+
+    def try_spend(self) -> bool:
+        if self.credits < 1:
+            return False
+        self.credits -= 1
+        return True
+
+
+latency_tracker = LatencyTracker()
+hedge_budget = HedgeBudget()
+
+Call = Callable[[object], Awaitable]
+
+
+async def _timed(backend, call: Call):
+    start = time.perf_counter()
+    result = await call(backend)
+    latency_tracker.record(backend.name, time.perf_counter() - start)
+    return result
+
+
+async def run_hedged(primary, hedge_backend, call: Call, enabled: bool = HEDGING_ENABLED, can_hedge: Callable[[object], bool] | None = None):
+    """Run `call(primary)`, hedging with `call(hedge_backend)` when it is slow.
+
+    Returns (result, backend_that_produced_it). The hedge is sent once the
+    primary has taken longer than the primary's HEDGE_PERCENTILE latency,
+    if `can_hedge(hedge_backend)` (free capacity, say) and the hedge budget
+    allow; the first success wins and the other call is cancelled. Fails
+    only when every call that was sent failed.
+    """
+    hedge_budget.earn()
+    name = primary.name
+    delay = latency_tracker.percentile(name, HEDGE_PERCENTILE) if enabled else None
+    if delay is None or hedge_backend is None:
+        return await _timed(primary, call), primary
+
+    primary_task = asyncio.create_task(_timed(primary, call))
+    tasks = {primary_task: primary}
+    try:
+        done, _ = await asyncio.wait({primary_task}, timeout=max(delay, HEDGE_MIN_DELAY_MS / 1000))
+        if done:
+            return primary_task.result(), primary
+
+        if can_hedge is not None and not can_hedge(hedge_backend):
+            HEDGE_REQUESTS.labels(backend=name, outcome="no_capacity").inc()
+            return await primary_task, primary
+        if not hedge_budget.try_spend():
+            HEDGE_REQUESTS.labels(backend=name, outcome="over_budget").inc()
+            return await primary_task, primary
+        HEDGE_REQUESTS.labels(backend=name, outcome="sent").inc()
+        tasks[asyncio.create_task(_timed(hedge_backend, call))] = hedge_backend
+
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    HEDGE_WINS.labels(backend=name, winner="primary" if task is primary_task else "hedge").inc()
+                    return task.result(), tasks[task]
+        # Both failed: report the primary's error, as an unhedged call would
+        return primary_task.result(), primary
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -1,7 +1,19 @@
+from collections.abc import AsyncIterator
 from app.backends.base import InferenceBackend
+from app.backends.batching import MicroBatcher
+from app.config import LOCAL_BATCH_MAX_SIZE, LOCAL_BATCH_MAX_WAIT_MS
 import asyncio
 
 class LocalBackend(InferenceBackend):
+    def __init__(self):
+        # Concurrent predict calls are grouped and served by predict_batch
+        self.batcher = MicroBatcher(
+            self.predict_batch,
+            max_batch_size=LOCAL_BATCH_MAX_SIZE,
+            max_wait_seconds=LOCAL_BATCH_MAX_WAIT_MS / 1000,
+            name="local",
+        )
+
     async def predict(
             self, 
             prompt: str,
@@ -9,7 +21,30 @@ class LocalBackend(InferenceBackend):
             temperature: float,
             max_tokens: int
     ) -> str:
-        
+        return await self.batcher.submit(prompt, model, temperature, max_tokens)
+
+    async def predict_batch(
+            self,
+            prompts: list[str],
+            model: str,
+            temperature: float,
+            max_tokens: int
+    ) -> list[str]:
+        # One simulated forward pass for the whole batch
         await asyncio.sleep(0.2)
 
-        return f"[local Model: {model}] processed: {prompt}"
\ No newline at end of file
+        return [f"[local Model: {model}] processed: {prompt}" for prompt in prompts]
+
+    async def predict_stream(
+            self,
+            prompt: str,
+            model: str,
+            temperature: float,
+            max_tokens: int
+    ) -> AsyncIterator[str]:
+        # Same total latency as predict, spread across the emitted words
+        words = f"[local Model: {model}] processed: {prompt}".split(" ")
+        delay = 0.2 / len(words)
+        for i, word in enumerate(words):
+            await asyncio.sleep(delay)
+            yield word if i == 0 else " " + word
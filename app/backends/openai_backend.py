@@ -1,14 +1,23 @@
 import os
+from collections.abc import AsyncIterator
+import structlog
 from openai import AsyncOpenAI
-from app.backends.base import InferenceBackend
+from app.backends.base import InferenceBackend, Usage
+from app.backends.transport import http_client, prewarm
+
+logger = structlog.get_logger()
 
 class OpenAIBackend(InferenceBackend):
-    def __init__(self):
-        api_key = os.getenv("OPENAI_API_KEY")
+    def __init__(self, api_key_env: str = "OPENAI_API_KEY", base_url: str | None = None):
+        api_key = os.getenv(api_key_env)
         if not api_key:
-            raise ValueError("OPENAI_API_KEY not set")
+            raise ValueError(f"{api_key_env} not set")
         
-        self.client = AsyncOpenAI(api_key=api_key)
+        # The provider's shared connection pool (see app/backends/transport.py)
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client("openai"))
+
+    async def warm_up(self, connections: int):
+        await prewarm("openai", str(self.client.base_url), connections)
 
     async def predict(
             self,
@@ -17,6 +26,16 @@ class OpenAIBackend(InferenceBackend):
             temperature: float,
             max_tokens: int
     ) -> str:
+        output, _ = await self.predict_with_usage(prompt, model, temperature, max_tokens)
+        return output
+
+    async def predict_with_usage(
+            self,
+            prompt: str,
+            model: str,
+            temperature: float,
+            max_tokens: int
+    ) -> tuple[str, Usage]:
         
         try:
             response = await self.client.chat.completions.create(
@@ -26,9 +45,40 @@ class OpenAIBackend(InferenceBackend):
                 max_tokens=max_tokens
             )
         except Exception as e:
-            # log error
-            print(f"OpenAI API error: {e}")
+            logger.warning("provider_api_error", provider="openai", model=model, error=str(e))
+            raise
+
+        output = str(response.choices[0].message.content)
+        if response.usage is None:
+            return output, Usage.estimate(prompt, output)
+        return output, Usage(response.usage.prompt_tokens, response.usage.completion_tokens)
+
+    async def predict_stream(
+            self,
+            prompt: str,
+            model: str,
+            temperature: float,
+            max_tokens: int
+    ) -> AsyncIterator[str | Usage]:
+
+        try:
+            stream = await self.client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True,
+                # The last chunk then carries the usage, with no choices
+                stream_options={"include_usage": True},
+            )
+        except Exception as e:
+            logger.warning("provider_api_error", provider="openai", model=model, error=str(e))
             raise
 
-        return str(response.choices[0].message.content)
-    
\ No newline at end of file
+        # Closes the response, and frees its connection, if the caller stops early
+        async with stream:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                if chunk.usage is not None:
+                    yield Usage(chunk.usage.prompt_tokens, chunk.usage.completion_tokens)
@@ -0,0 +1,191 @@
+import asyncio
+import itertools
+import math
+import random
+import time
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
+
+from app import deadline
+from app.backends.base import InferenceBackend, Usage
+from app.backends.circuit_breaker import CircuitBreaker, CircuitState
+from app.config import LOAD_BALANCER_EWMA_DECAY_SECONDS
+from app.metrics import ENDPOINT_SELECTIONS, ENDPOINT_OUTSTANDING, ENDPOINT_LATENCY
+
+# Latency assumed for an endpoint before its first response
+_INITIAL_LATENCY = 0.5
+
+
+class Endpoint:
+    """One backend instance (server, region or account) inside a pool."""
+
+    def __init__(self, name: str, backend: InferenceBackend, breaker: CircuitBreaker):
+        self.name = name
+        self.backend = backend
+        self.breaker = breaker
+        self.outstanding = 0
+        self.ewma_latency = _INITIAL_LATENCY
+        self._last_update = time.monotonic()
+
+    def observe(self, seconds: float):
+        # Time-decayed EWMA: a sample counts for more the longer since the last one
+        now = time.monotonic()
+        weight = 1 - math.exp(-(now - self._last_update) / LOAD_BALANCER_EWMA_DECAY_SECONDS)
+        self.ewma_latency += max(weight, 0.1) * (seconds - self.ewma_latency)
+        self._last_update = now
+
+
+class Strategy(ABC):
+    """Picks one endpoint among healthy candidates (never an empty list)."""
+
+    @abstractmethod
+    def select(self, endpoints: list[Endpoint]) -> Endpoint:
+        pass
+
+
+class RoundRobin(Strategy):
+    def __init__(self):
+        self._counter = itertools.count()
+
+    def select(self, endpoints):
+        return endpoints[next(self._counter) % len(endpoints)]
+
+
+class LeastOutstanding(Strategy):
+    def select(self, endpoints):
+        fewest = min(e.outstanding for e in endpoints)
+        return random.choice([e for e in endpoints if e.outstanding == fewest])
+
+
+class PowerOfTwoEWMA(Strategy):
+    """Power of two choices, scored by latency EWMA x (outstanding + 1)."""
+
+    def select(self, endpoints):
+        if len(endpoints) == 1:
+            return endpoints[0]
+        a, b = random.sample(endpoints, 2)
+        return min(a, b, key=lambda e: e.ewma_latency * (e.outstanding + 1))
+
+
+STRATEGIES = {
+    "round_robin": RoundRobin,
+    "least_outstanding": LeastOutstanding,
+    "ewma": PowerOfTwoEWMA,
+}
+
+
+class EndpointPool(InferenceBackend):
+    """A provider's endpoints behind one backend interface.
+
+    Each call goes to the endpoint chosen by `strategy` among those whose
+    own circuit breaker is closed; an endpoint due a half-open probe takes
+    the call first, so a recovered endpoint rejoins the rotation. Outcomes
+    feed both the endpoint's breaker and its latency EWMA.
+    """
+
+    def __init__(self, provider: str, endpoints: list[Endpoint], strategy: Strategy):
+        if not endpoints:
+            raise ValueError(f"{provider} has no endpoints")
+        self.provider = provider
+        self.endpoints = endpoints
+        self.strategy = strategy
+        self.strategy_name = next((k for k, v in STRATEGIES.items() if isinstance(strategy, v)), strategy.__class__.__name__)
+
+    @property
+    def name(self) -> str:
+        return self.endpoints[0].backend.name
+
+    def select(self) -> Endpoint:
+        healthy = []
+        for endpoint in self.endpoints:
+            if endpoint.breaker.state == CircuitState.CLOSED:
+                healthy.append(endpoint)
+            elif endpoint.breaker.allow_request():
+                ENDPOINT_SELECTIONS.labels(provider=self.provider, endpoint=endpoint.name, strategy="probe").inc()
+                return endpoint
+        if not healthy:
+            raise RuntimeError(f"No healthy {self.provider} endpoints")
+        endpoint = self.strategy.select(healthy)
+        ENDPOINT_SELECTIONS.labels(provider=self.provider, endpoint=endpoint.name, strategy=self.strategy_name).inc()
+        return endpoint
+
+    def _begin(self, endpoint: Endpoint) -> float:
+        """Count the call as outstanding; returns its start time."""
+        endpoint.outstanding += 1
+        ENDPOINT_OUTSTANDING.labels(provider=self.provider, endpoint=endpoint.name).inc()
+        return time.perf_counter()
+
+    def _end(self, endpoint: Endpoint, elapsed: float | None, ok: bool | None):
+        """Settle a call. ok=None means abandoned (cancelled before its
+        timeout), which says nothing about the endpoint's health and hands
+        back any probe slot; elapsed=None means latency was already observed.
+        """
+        endpoint.outstanding -= 1
+        ENDPOINT_OUTSTANDING.labels(provider=self.provider, endpoint=endpoint.name).dec()
+        if elapsed is not None and (ok or elapsed > endpoint.ewma_latency):
+            # A cancelled call's elapsed time is still a lower bound on its
+            # latency, and keeps a hung endpoint from looking fast
+            endpoint.observe(elapsed)
+            ENDPOINT_LATENCY.labels(provider=self.provider, endpoint=endpoint.name).set(endpoint.ewma_latency)
+        if ok:
+            endpoint.breaker.record_success()
+        elif ok is False:
+            endpoint.breaker.record_failure()
+        else:
+            endpoint.breaker.release_probe()
+
+    async def _call(self, method: str, **kwargs):
+        endpoint = self.select()
+        start = self._begin(endpoint)
+        ok = None
+        try:
+            result = await getattr(endpoint.backend, method)(**kwargs)
+            ok = True
+            return result
+        except asyncio.CancelledError:
+            # Cancelled at the route's timeout: the endpoint hung
+            if deadline.call_overran():
+                ok = False
+            raise
+        except Exception:
+            ok = False
+            raise
+        finally:
+            self._end(endpoint, time.perf_counter() - start, ok)
+
+    async def predict(self, prompt: str, model: str, temperature: float, max_tokens: int) -> str:
+        return await self._call("predict", prompt=prompt, model=model, temperature=temperature, max_tokens=max_tokens)
+
+    async def predict_with_usage(self, prompt: str, model: str, temperature: float, max_tokens: int) -> tuple[str, Usage]:
+        return await self._call("predict_with_usage", prompt=prompt, model=model, temperature=temperature, max_tokens=max_tokens)
+
+    async def predict_batch(self, prompts: list[str], model: str, temperature: float, max_tokens: int) -> list[str]:
+        return await self._call("predict_batch", prompts=prompts, model=model, temperature=temperature, max_tokens=max_tokens)
+
+    async def warm_up(self, connections: int):
+        await asyncio.gather(*(endpoint.backend.warm_up(connections) for endpoint in self.endpoints))
+
+    async def predict_stream(self, prompt: str, model: str, temperature: float, max_tokens: int) -> AsyncIterator[str | Usage]:
+        endpoint = self.select()
+        start = self._begin(endpoint)
+        ok = None
+        elapsed = None
+        try:
+            async for chunk in endpoint.backend.predict_stream(
+                prompt=prompt, model=model, temperature=temperature, max_tokens=max_tokens
+            ):
+                if elapsed is None:
+                    # Time to first chunk is what callers wait on
+                    elapsed = time.perf_counter() - start
+                    endpoint.observe(elapsed)
+                yield chunk
+            ok = True
+        except asyncio.CancelledError:
+            if deadline.call_overran():
+                ok = False
+            raise
+        except Exception:
+            ok = False
+            raise
+        finally:
+            self._end(endpoint, time.perf_counter() - start if elapsed is None else None, ok)
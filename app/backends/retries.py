@@ -0,0 +1,33 @@
+import random
+
+from app.config import RETRY_BACKOFF_BASE, RETRY_BUDGET_RATIO, RETRY_BUDGET_MIN_RETRIES
+
+
+def backoff_delay(attempt: int, base: float = RETRY_BACKOFF_BASE) -> float:
+    """Exponential backoff with full jitter, so retries from many requests
+    that failed together don't hit the provider again in lockstep."""
+    return random.uniform(0, base * (2 ** attempt))
+
+
+class RetryBudget:
+    """Token bucket limiting a provider's retries to a share of its traffic.
+
+    Every first attempt deposits `ratio` tokens and every retry withdraws
+    one, so during an outage retries add at most `ratio` extra load. The
+    bucket holds up to `min_retries` tokens (and starts full), so a quiet
+    provider can still retry an occasional failure.
+    """
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, min_retries: int = RETRY_BUDGET_MIN_RETRIES):
+        self.ratio = ratio
+        self.capacity = float(max(min_retries, 1))
+        self.tokens = self.capacity
+
+    def deposit(self):
+        self.tokens = min(self.capacity, self.tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
@@ -1,55 +1,160 @@
+import asyncio
+import json
+
+import structlog
+
 from app.backends.local import LocalBackend
 from app.backends.openai_backend import OpenAIBackend
 from app.backends.gemini_backend import GeminiBackend
-from app.backends.circuit_breaker import CircuitBreaker
+from app.backends.circuit_breaker import CircuitBreaker, CircuitState
+from app.backends.pool import Endpoint, EndpointPool, STRATEGIES
+from app.backends.routing import Route, load_routing_table
+from app.backends.bulkhead import Bulkhead
+from app.backends.retries import RetryBudget
+from app.config import (
+    BACKEND_ENDPOINTS,
+    LOAD_BALANCER_STRATEGY,
+    BULKHEAD_MAX_CONCURRENT,
+    BULKHEAD_MAX_QUEUE,
+    BULKHEAD_QUEUE_TIMEOUT_SECONDS,
+    BULKHEAD_LIMITS,
+)
 from app.metrics import (PROVIDER_FAILURES, PROVIDER_REJECTIONS)
 from fastapi import HTTPException
 
+logger = structlog.get_logger()
+
+# How each provider builds one endpoint from its BACKEND_ENDPOINTS entry
+_FACTORIES = {
+    "local": lambda spec: LocalBackend(),
+    "openai": lambda spec: OpenAIBackend(
+        api_key_env=spec.get("api_key_env", "OPENAI_API_KEY"),
+        base_url=spec.get("base_url"),
+    ),
+    "gemini": lambda spec: GeminiBackend(api_key_env=spec.get("api_key_env", "GEMINI_API_KEY")),
+}
+
 class BackendRouter:
     def __init__(self):
-        self.backends = {
-            "local": LocalBackend(),
-            "openai": None,  # OpenAIBackend will be initialized lazily
-            "gemini": None,  # GeminiBackend will be initialized lazily
-        }
+        self.endpoint_specs = json.loads(BACKEND_ENDPOINTS) if BACKEND_ENDPOINTS else {}
+        # Swapped wholesale by watch_routing_config on reload
+        self.table = load_routing_table()
         self.breakers = {
-            "openai": CircuitBreaker(failure_threshold=3, cooldown_seconds=60),
-            "gemini": CircuitBreaker(failure_threshold=3, cooldown_seconds=60),
-            "local": CircuitBreaker(failure_threshold=5, cooldown_seconds=30),
+            "openai": CircuitBreaker("openai", min_requests=3, cooldown_seconds=60),
+            "gemini": CircuitBreaker("gemini", min_requests=3, cooldown_seconds=60),
+            "local": CircuitBreaker("local", min_requests=5, cooldown_seconds=30),
+        }
+        bulkhead_limits = json.loads(BULKHEAD_LIMITS) if BULKHEAD_LIMITS else {}
+        self.bulkheads = {
+            provider: Bulkhead(
+                provider,
+                max_concurrent=bulkhead_limits.get(provider, {}).get("max_concurrent", BULKHEAD_MAX_CONCURRENT),
+                max_queue=bulkhead_limits.get(provider, {}).get("max_queue", BULKHEAD_MAX_QUEUE),
+                queue_timeout=bulkhead_limits.get(provider, {}).get("queue_timeout_seconds", BULKHEAD_QUEUE_TIMEOUT_SECONDS),
+            )
+            for provider in self.breakers
+        }
+        self.retry_budgets = {provider: RetryBudget() for provider in self.breakers}
+        self.backends = {
+            "local": self._build_pool("local"),
+            "openai": None,  # OpenAI pool will be initialized lazily
+            "gemini": None,  # Gemini pool will be initialized lazily
         }
+
+    def _build_pool(self, provider: str) -> EndpointPool:
+        """One endpoint per BACKEND_ENDPOINTS entry, each with its own breaker."""
+        provider_breaker = self.breakers[provider]
+        endpoints = [
+            Endpoint(
+                spec.get("name", str(i)),
+                _FACTORIES[provider](spec),
+                CircuitBreaker(
+                    f"{provider}:{spec.get('name', i)}",
+                    min_requests=provider_breaker.min_requests,
+                    cooldown_seconds=provider_breaker.cooldown_seconds,
+                ),
+            )
+            for i, spec in enumerate(self.endpoint_specs.get(provider) or [{"name": "default"}])
+        ]
+        return EndpointPool(provider, endpoints, STRATEGIES[LOAD_BALANCER_STRATEGY]())
+
+    def provider_of(self, backend) -> str | None:
+        for provider, candidate in self.backends.items():
+            if candidate is backend:
+                return provider
+        return None
+
+    def breaker_for(self, backend) -> CircuitBreaker | None:
+        """The breaker guarding `backend`, which outcomes must be recorded on."""
+        provider = self.provider_of(backend)
+        return self.breakers[provider] if provider else None
+
+    def bulkhead_for(self, backend) -> Bulkhead | None:
+        provider = self.provider_of(backend)
+        return self.bulkheads[provider] if provider else None
+
+    def retry_budget_for(self, backend) -> RetryBudget | None:
+        provider = self.provider_of(backend)
+        return self.retry_budgets[provider] if provider else None
     
+    def _pool(self, provider: str) -> EndpointPool:
+        # OpenAI and Gemini pools are built on first use: they need API keys
+        if self.backends.get(provider) is None:
+            self.backends[provider] = self._build_pool(provider)
+        return self.backends[provider]
+
+    async def warm_up(self, connections: int):
+        """Build the pool of every provider the routing table uses and open
+        its connections, so no request pays for client setup or handshakes.
+        Providers without credentials are skipped until first use."""
+        providers = {name for route in self.table.routes for name in [route.provider, *route.fallbacks]}
+        pools = []
+        for provider in sorted(providers):
+            try:
+                pools.append(self._pool(provider))
+            except ValueError as e:
+                logger.info("provider_warmup_skipped", provider=provider, reason=str(e))
+        await asyncio.gather(*(pool.warm_up(connections) for pool in pools))
+
+    def route_for(self, model: str) -> Route:
+        route = self.table.lookup(model)
+        if route is None:
+            raise HTTPException(status_code=400, detail=f"No route for model {model}")
+        return route
+
     def get_backend_for_model(self, model: str):
         """
-        Strategy:
-        - if model starts with "gpt-" use openAI
-        - otherwise use local
+        Strategy: the routing table (see app/backends/routing.py) picks the
+        provider and its fallback chain. Returns (backend, breaker, provider,
+        fallbacks), fallbacks being the chain's pools in order, less those
+        whose circuit is open or that aren't configured on this deployment.
         """
-
-        if model.startswith("gpt-"):
-            provider = "openai"
-            fallback = self.backends["local"]
-            if self.backends["openai"] is None:
-                self.backends["openai"] = OpenAIBackend()
-            backend = self.backends["openai"]
-        elif model.startswith("gemini-"):
-            provider = "gemini"
-            fallback = self.backends["local"]
-            if self.backends["gemini"] is None:                
-                self.backends["gemini"] = GeminiBackend()
-            backend = self.backends["gemini"]
-        else:
-            provider = "local"
-            fallback = None
-            backend = self.backends["local"]
+        route = self.route_for(model)
+        provider = route.provider
+        backend = self._pool(provider)
+        fallbacks = []
+        for name in route.fallbacks:
+            if name == provider or self.breakers[name].state == CircuitState.OPEN:
+                continue
+            try:
+                fallbacks.append(self._pool(name))
+            except ValueError as e:
+                logger.info("fallback_unavailable", provider=name, reason=str(e))
 
         breaker = self.breakers[provider]
 
-        if not breaker.allow_request():
+        # Only checks the circuits: the probe slot of a half-open one is taken
+        # when a call actually runs, not by requests the cache will answer
+        if not breaker.is_available():
             PROVIDER_REJECTIONS.labels(provider=provider).inc()
+            # Skip straight to the fallbacks while the primary's circuit is open
+            for i, fallback in enumerate(fallbacks):
+                fallback_provider = self.provider_of(fallback)
+                if self.breakers[fallback_provider].is_available():
+                    return fallback, self.breakers[fallback_provider], fallback_provider, fallbacks[i + 1:]
             raise HTTPException(
                 status_code=503, 
                 detail=f"{provider} backend temporarily unavailable"
             )
         
-        return backend, breaker, provider, fallback
-    
\ No newline at end of file
+        return backend, breaker, provider, fallbacks
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import os
+
+import structlog
+
+from app.config import (
+    INFERENCE_TIMEOUT_SECONDS,
+    MAX_RETRIES,
+    ROUTING_CONFIG_PATH,
+    ROUTING_RELOAD_INTERVAL_SECONDS,
+)
+from app.metrics import ROUTING_RELOADS
+
+try:
+    import yaml
+except ImportError:  # YAML routing files need the "routing" extra; JSON always works
+    yaml = None
+
+logger = structlog.get_logger()
+
+PROVIDERS = ("local", "openai", "gemini")
+
+# Used when ROUTING_CONFIG_PATH is unset; same behaviour as the old hard-coded chain
+DEFAULT_ROUTES = [
+    {"match": "gpt-*", "provider": "openai", "fallbacks": ["local"]},
+    {"match": "gemini-*", "provider": "gemini", "fallbacks": ["local"]},
+    {"match": "*", "provider": "local"},
+]
+
+
+class Route:
+    def __init__(self, match: str, provider: str, fallbacks: list[str], timeout_seconds: float, max_retries: int):
+        self.match = match
+        self.provider = provider
+        self.fallbacks = fallbacks
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+
+    @classmethod
+    def from_spec(cls, spec: dict) -> "Route":
+        match = spec.get("match")
+        provider = spec.get("provider")
+        fallbacks = list(spec.get("fallbacks", []))
+        if not isinstance(match, str) or not match:
+            raise ValueError(f"route needs a non-empty 'match': {spec}")
+        for name in [provider, *fallbacks]:
+            if name not in PROVIDERS:
+                raise ValueError(f"unknown provider {name!r} in route {match!r}")
+        max_retries = int(spec.get("max_retries", MAX_RETRIES))
+        if max_retries < 1:
+            # Like MAX_RETRIES, this counts attempts on the primary
+            raise ValueError(f"max_retries must be at least 1 in route {match!r}")
+        return cls(
+            match=match,
+            provider=provider,
+            fallbacks=fallbacks,
+            timeout_seconds=float(spec.get("timeout_seconds", INFERENCE_TIMEOUT_SECONDS)),
+            max_retries=max_retries,
+        )
+
+
+class _Node:
+    __slots__ = ("children", "exact", "prefix")
+
+    def __init__(self):
+        self.children: dict[str, _Node] = {}
+        self.exact: Route | None = None
+        self.prefix: Route | None = None
+
+
+class RoutingTable:
+    """Model name -> Route, compiled into a character trie.
+
+    A match of "gpt-4o" is exact; "gpt-*" matches any model starting with
+    "gpt-", and "*" matches everything. Exact beats prefix, and a longer
+    prefix beats a shorter one, so lookups are O(len(model)) whatever the
+    number of routes or their order.
+    """
+
+    def __init__(self, routes: list[Route]):
+        self.routes = routes
+        self._root = _Node()
+        for route in routes:
+            is_prefix = route.match.endswith("*")
+            node = self._root
+            for char in route.match[:-1] if is_prefix else route.match:
+                node = node.children.setdefault(char, _Node())
+            if is_prefix:
+                node.prefix = node.prefix or route
+            else:
+                node.exact = node.exact or route
+
+    @classmethod
+    def from_specs(cls, specs: list[dict]) -> "RoutingTable":
+        return cls([Route.from_spec(spec) for spec in specs])
+
+    def lookup(self, model: str) -> Route | None:
+        node = self._root
+        best = node.prefix
+        for char in model:
+            node = node.children.get(char)
+            if node is None:
+                return best
+            best = node.prefix or best
+        return node.exact or best
+
+
+def load_routing_table(path: str = ROUTING_CONFIG_PATH) -> RoutingTable:
+    """Parse a YAML or JSON routing file ({"routes": [...]}), or the defaults."""
+    if not path:
+        return RoutingTable.from_specs(DEFAULT_ROUTES)
+    with open(path) as f:
+        text = f.read()
+    if path.endswith((".yaml", ".yml")):
+        if yaml is None:
+            raise RuntimeError("PyYAML is required for YAML routing files")
+        config = yaml.safe_load(text)
+    else:
+        config = json.loads(text)
+    return RoutingTable.from_specs(config["routes"])
+
+
+async def watch_routing_config(router, path: str = ROUTING_CONFIG_PATH, interval: float = ROUTING_RELOAD_INTERVAL_SECONDS):
+    """Background task: reload the routing file whenever it changes.
+
+    The new table is compiled completely before it replaces the old one,
+    so requests see either table, never a mix. A broken file is logged and
+    the current table kept.
+    """
+    if not path:
+        return
+    last_mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            mtime = os.path.getmtime(path)
+            if mtime == last_mtime:
+                continue
+            last_mtime = mtime
+            router.table = load_routing_table(path)
+            ROUTING_RELOADS.labels(result="success").inc()
+            logger.info("routing_config_reloaded", path=path, routes=len(router.table.routes))
+        except Exception as e:
+            ROUTING_RELOADS.labels(result="error").inc()
+            logger.error("routing_config_reload_failed", path=path, error=str(e))
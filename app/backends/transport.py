@@ -0,0 +1,141 @@
+import asyncio
+import json
+
+import httpx
+import structlog
+
+from app.config import (
+    HTTP_POOL_MAX_CONNECTIONS,
+    HTTP_POOL_MAX_KEEPALIVE,
+    HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    HTTP_CONNECT_TIMEOUT_SECONDS,
+    HTTP2_ENABLED,
+    HTTP_POOL_LIMITS,
+    HTTP_POOL_METRICS_INTERVAL_SECONDS,
+)
+from app.metrics import HTTP_POOL_IN_FLIGHT, HTTP_POOL_UTILIZATION, HTTP_POOL_WARMUP
+
+try:
+    import h2  # noqa: F401
+except ImportError:  # HTTP/2 needs the "http2" extra; HTTP/1.1 keep-alive otherwise
+    h2 = None
+
+logger = structlog.get_logger()
+
+_pool_limits = json.loads(HTTP_POOL_LIMITS) if HTTP_POOL_LIMITS else {}
+# One client per provider, shared by all of its endpoints
+_clients: dict[str, httpx.AsyncClient] = {}
+_transports: dict[str, "_CountingTransport"] = {}
+
+
+class _CountingTransport(httpx.AsyncBaseTransport):
+    """Counts a provider's requests in flight, through httpx's public
+    transport interface only: a request counts from when it is sent until
+    its response body is closed.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, limits: httpx.Limits):
+        self._transport = transport
+        self.max_connections = limits.max_connections
+        self.in_flight = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.in_flight += 1
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            self.in_flight -= 1
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_CountedStream(response.stream, self),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class _CountedStream(httpx.AsyncByteStream):
+    def __init__(self, stream, transport: _CountingTransport):
+        self._stream = stream
+        self._transport = transport
+        self._closed = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._transport.in_flight -= 1
+
+
+def http_client(provider: str) -> httpx.AsyncClient:
+    """The provider's pooled HTTP client, created on first use."""
+    client = _clients.get(provider)
+    if client is None:
+        overrides = _pool_limits.get(provider, {})
+        limits = httpx.Limits(
+            max_connections=overrides.get("max_connections", HTTP_POOL_MAX_CONNECTIONS),
+            max_keepalive_connections=overrides.get("max_keepalive_connections", HTTP_POOL_MAX_KEEPALIVE),
+            keepalive_expiry=overrides.get("keepalive_expiry_seconds", HTTP_KEEPALIVE_EXPIRY_SECONDS),
+        )
+        http2 = overrides.get("http2", HTTP2_ENABLED) and h2 is not None
+        transport = _CountingTransport(httpx.AsyncHTTPTransport(limits=limits, http2=http2), limits)
+        client = httpx.AsyncClient(
+            transport=transport,
+            # Read time is bounded by the request deadline, not here
+            timeout=httpx.Timeout(None, connect=HTTP_CONNECT_TIMEOUT_SECONDS),
+        )
+        _clients[provider] = client
+        _transports[provider] = transport
+        logger.info("http_pool_created", provider=provider, max_connections=limits.max_connections, http2=http2)
+    return client
+
+
+async def prewarm(provider: str, url: str, connections: int):
+    """Open up to `connections` connections to `url` so first requests skip
+    the TCP and TLS handshakes. Any HTTP response counts: only the
+    connection matters. With HTTP/2 they share one connection.
+    """
+    client = http_client(provider)
+
+    async def touch():
+        try:
+            await client.head(url)
+            HTTP_POOL_WARMUP.labels(provider=provider, result="success").inc()
+        except httpx.HTTPError as e:
+            HTTP_POOL_WARMUP.labels(provider=provider, result="error").inc()
+            logger.warning("http_pool_warmup_failed", provider=provider, url=url, error=str(e))
+
+    await asyncio.gather(*(touch() for _ in range(connections)))
+
+
+def report_pool_usage():
+    for provider, transport in _transports.items():
+        HTTP_POOL_IN_FLIGHT.labels(provider=provider).set(transport.in_flight)
+        max_connections = transport.max_connections
+        HTTP_POOL_UTILIZATION.labels(provider=provider).set(transport.in_flight / max_connections if max_connections else 0)
+
+
+async def run_pool_metrics(interval: float = HTTP_POOL_METRICS_INTERVAL_SECONDS):
+    """Background task: sample connection pool usage into the gauges."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            report_pool_usage()
+        except Exception as e:
+            logger.warning("http_pool_metrics_failed", error=str(e))
+
+
+async def close_http_clients():
+    clients = list(_clients.values())
+    _clients.clear()
+    _transports.clear()
+    await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
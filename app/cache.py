@@ -1,11 +1,36 @@
 import hashlib
 import json
-import redis.asyncio as redis
-import os
 import asyncio
+import struct
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+
+import structlog
+
+from app.config import (
+    L1_CACHE_MAX_BYTES,
+    L1_CACHE_TTL_SECONDS,
+    CACHE_INVALIDATION_CHANNEL,
+    CACHE_COMPRESSION_MIN_BYTES,
+    CACHE_COMPRESSION_LEVEL,
+)
+from app.redis import redis_bytes_client
+from app.metrics import (
+    CACHE_TIER_LOOKUPS,
+    L1_CACHE_BYTES,
+    CACHE_STORED_BYTES,
+    CACHE_COMPRESSION_RATIO,
+)
+
+logger = structlog.get_logger()
 
 LOCK_TTL = 10
 
+# Identifies this process in invalidation messages so it can skip its own
+_NODE_ID = uuid.uuid4().hex
+
 def build_cache_key(
     
         tenant_id: str, 
@@ -23,21 +48,239 @@ def build_cache_key(
     payload = json.dumps(normalized, sort_keys=True)
     digest = hashlib.sha256(payload.encode()).hexdigest()
 
-    return f"cache:{digest}"
+    # Hash tag: the key's lock ("lock:" + key) lands in the same Cluster slot
+    return f"cache:{{{digest}}}"
 
-    
-redis_client = redis.from_url(os.environ.get("REDIS_URL", "redis://localhost:6379"))
+
+# Cache value format v1:
+#   magic (2 bytes) | version (1) | flags (1) | len(backend_name) (2) | backend_name | output
+# `output` is zlib-compressed when FLAG_COMPRESSED is set. Entries written
+# before this format are plain JSON and are still decoded transparently.
+_VALUE_MAGIC = b"\x00G"
+_VALUE_VERSION = 1
+_VALUE_HEADER = struct.Struct("!2sBBH")
+_FLAG_COMPRESSED = 0x01
+
+def encode_cache_value(output: str, backend_name: str) -> bytes:
+    body = output.encode("utf-8")
+    raw_size = len(body)
+    flags = 0
+
+    if raw_size >= CACHE_COMPRESSION_MIN_BYTES:
+        compressed = zlib.compress(body, CACHE_COMPRESSION_LEVEL)
+        if len(compressed) < raw_size:
+            body = compressed
+            flags |= _FLAG_COMPRESSED
+
+    name = backend_name.encode("utf-8")
+    value = _VALUE_HEADER.pack(_VALUE_MAGIC, _VALUE_VERSION, flags, len(name)) + name + body
+
+    CACHE_STORED_BYTES.observe(len(value))
+    if raw_size:
+        CACHE_COMPRESSION_RATIO.observe(raw_size / len(body))
+    return value
+
+def decode_cache_value(value: bytes | str) -> dict:
+    """Return {"output", "backend_name"} from either format."""
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+
+    if not value.startswith(_VALUE_MAGIC):
+        # Legacy JSON entry
+        return json.loads(value)
+
+    _, version, flags, name_len = _VALUE_HEADER.unpack_from(value)
+    if version != _VALUE_VERSION:
+        raise ValueError(f"Unsupported cache value version: {version}")
+
+    offset = _VALUE_HEADER.size
+    backend_name = value[offset:offset + name_len].decode("utf-8")
+    body = value[offset + name_len:]
+    if flags & _FLAG_COMPRESSED:
+        body = zlib.decompress(body)
+
+    return {"output": body.decode("utf-8"), "backend_name": backend_name}
+
+
+# Values are binary (see encode_cache_value)
+redis_client = redis_bytes_client
 
 DEFAULT_CACHE_TTL = 60*5
 
+class L1Cache:
+    """In-process LRU in front of Redis, bounded by total value bytes.
+
+    Entries never outlive the Redis copy: their TTL is capped by the
+    remaining Redis TTL at the time they are filled.
+    """
+
+    def __init__(self, max_bytes: int = L1_CACHE_MAX_BYTES, ttl_seconds: float = L1_CACHE_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.size_bytes = 0
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+
+    def get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self.invalidate(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self.invalidate(key)
+        ttl = min(ttl, self.ttl_seconds)
+        if ttl <= 0 or len(value) > self.max_bytes:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self.size_bytes += len(value)
+        while self.size_bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size_bytes -= len(evicted)
+        L1_CACHE_BYTES.set(self.size_bytes)
+
+    def invalidate(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size_bytes -= len(entry[1])
+            L1_CACHE_BYTES.set(self.size_bytes)
+
+    def clear(self):
+        self._entries.clear()
+        self.size_bytes = 0
+        L1_CACHE_BYTES.set(0)
+
+
+l1_cache = L1Cache()
+
+
+def l1_get(key: str) -> bytes | None:
+    """The L1 tier of cache_get on its own."""
+    value = l1_cache.get(key)
+    CACHE_TIER_LOOKUPS.labels(tier="l1", result="miss" if value is None else "hit").inc()
+    return value
+
+def remember_redis_value(key: str, value: bytes | None, pttl: int) -> bytes | None:
+    """Record a Redis-tier lookup fetched elsewhere, filling L1 on a hit."""
+    if value is None:
+        CACHE_TIER_LOOKUPS.labels(tier="redis", result="miss").inc()
+        return None
+    CACHE_TIER_LOOKUPS.labels(tier="redis", result="hit").inc()
+    if pttl > 0:
+        l1_cache.set(key, value, pttl / 1000)
+    return value
+
 async def cache_get(key: str):
-    return await redis_client.get(key)
+    value = l1_get(key)
+    if value is not None:
+        return value
+
+    # GET and PTTL in one round trip so the L1 copy can't outlive Redis
+    async with redis_client.pipeline(transaction=False) as pipe:
+        value, pttl = await pipe.get(key).pttl(key).execute()
+    return remember_redis_value(key, value, pttl)
+
+async def cache_set(key: str, value: bytes | str, ttl: int = DEFAULT_CACHE_TTL):
+    if isinstance(value, str):
+        value = value.encode()
+    l1_cache.set(key, value, ttl)
+    # Other nodes drop their L1 copy of the key
+    async with redis_client.pipeline(transaction=False) as pipe:
+        await pipe.set(key, value, ex=ttl).publish(
+            CACHE_INVALIDATION_CHANNEL, f"{_NODE_ID} {key}"
+        ).execute()
+
+async def cache_get_many(keys: list[str]) -> list[bytes | None]:
+    """Like cache_get for many keys, in key order, with one Redis round trip."""
+    values = [l1_cache.get(key) for key in keys]
+    misses = [i for i, value in enumerate(values) if value is None]
+    CACHE_TIER_LOOKUPS.labels(tier="l1", result="hit").inc(len(keys) - len(misses))
+    CACHE_TIER_LOOKUPS.labels(tier="l1", result="miss").inc(len(misses))
+    if not misses:
+        return values
+
+    miss_keys = [keys[i] for i in misses]
+    # GETs rather than one MGET, whose keys would span slots on Cluster
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for key in miss_keys:
+            pipe.get(key).pttl(key)
+        replies = await pipe.execute()
+
+    for i, key, value, pttl in zip(misses, miss_keys, replies[::2], replies[1::2]):
+        if value is None:
+            CACHE_TIER_LOOKUPS.labels(tier="redis", result="miss").inc()
+            continue
+        CACHE_TIER_LOOKUPS.labels(tier="redis", result="hit").inc()
+        values[i] = value
+        if pttl > 0:
+            l1_cache.set(key, value, pttl / 1000)
+    return values
+
+async def cache_set_many(items: dict[str, bytes], ttl: int = DEFAULT_CACHE_TTL):
+    """Like cache_set for many keys, pipelined into one round trip."""
+    if not items:
+        return
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for key, value in items.items():
+            l1_cache.set(key, value, ttl)
+            pipe.set(key, value, ex=ttl).publish(CACHE_INVALIDATION_CHANNEL, f"{_NODE_ID} {key}")
+        await pipe.execute()
+
+async def listen_for_cache_invalidations():
+    """Background task: drop L1 entries overwritten by other nodes.
+
+    Whenever the subscription drops we may have missed messages, so the
+    whole L1 is cleared before resubscribing.
+    """
+    while True:
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                node_id, _, key = message["data"].decode().partition(" ")
+                if node_id != _NODE_ID:
+                    l1_cache.invalidate(key)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("cache_invalidation_listener_error", error=str(e))
+            l1_cache.clear()
+            await asyncio.sleep(1)
+        finally:
+            try:
+                await pubsub.reset()
+            except Exception:
+                pass
+
+# Only touch the lock if we still own it (it may have expired and been re-acquired)
+_RELEASE_LOCK = redis_client.register_script("""
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+""")
+
+_EXTEND_LOCK = redis_client.register_script("""
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("expire", KEYS[1], ARGV[2])
+end
+return 0
+""")
 
-async def cache_set(key: str, value: str, ttl: int = DEFAULT_CACHE_TTL):
-    await redis_client.set(key, value, ex=ttl)
+async def acquire_lock(lock_key: str, token: str = "1", ttl: int = LOCK_TTL) -> bool:
+    return await redis_client.set(lock_key, token, nx=True, ex=ttl)
 
-async def acquire_lock(lock_key: str) -> bool:
-    return await redis_client.set(lock_key, "1", nx=True, ex=LOCK_TTL)
+async def release_lock(lock_key: str, token: str | None = None):
+    if token is None:
+        await redis_client.delete(lock_key)
+        return
+    await _RELEASE_LOCK(keys=[lock_key], args=[token])
 
-async def release_lock(lock_key: str):
-    await redis_client.delete(lock_key)
\ No newline at end of file
+async def extend_lock(lock_key: str, token: str, ttl: int = LOCK_TTL) -> bool:
+    return bool(await _EXTEND_LOCK(keys=[lock_key], args=[token, ttl]))
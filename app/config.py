@@ -2,15 +2,164 @@ import os
 import asyncio
 import random
 
-INFERENCE_TIMEOUT_SECONDS = 10
-MAX_RETRIES = 2
-RETRY_BACKOFF_BASE = 0.5
-
+# Before any setting below is read, so a local .env applies to all of them
 try:
     from dotenv import load_dotenv
     load_dotenv()
 except ImportError:
-    pass  # DATABASE_URL from env; dotenv optional for local .env
+    pass  # settings from env; dotenv optional for local .env
+
+INFERENCE_TIMEOUT_SECONDS = 10
+MAX_RETRIES = 2
+RETRY_BACKOFF_BASE = 0.5
+
+# Redis (see app/redis.py). REDIS_MODE is "standalone", "sentinel" (masters
+# found through REDIS_SENTINELS, "host:port,host:port") or "cluster".
+# Pool size and timeouts apply to each client (text and bytes).
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_MODE = os.getenv("REDIS_MODE", "standalone")
+REDIS_SENTINELS = os.getenv("REDIS_SENTINELS", "")
+REDIS_SENTINEL_SERVICE = os.getenv("REDIS_SENTINEL_SERVICE", "mymaster")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "64"))
+REDIS_POOL_TIMEOUT_SECONDS = float(os.getenv("REDIS_POOL_TIMEOUT_SECONDS", "1"))
+REDIS_SOCKET_TIMEOUT_SECONDS = float(os.getenv("REDIS_SOCKET_TIMEOUT_SECONDS", "2"))
+REDIS_CONNECT_TIMEOUT_SECONDS = float(os.getenv("REDIS_CONNECT_TIMEOUT_SECONDS", "1"))
+REDIS_HEALTH_CHECK_INTERVAL_SECONDS = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL_SECONDS", "30"))
+
+# Circuit breakers: open when at least this fraction of a provider's calls
+# in the window failed; optionally shared across workers through Redis
+CIRCUIT_BREAKER_FAILURE_RATE = float(os.getenv("CIRCUIT_BREAKER_FAILURE_RATE", "0.5"))
+CIRCUIT_BREAKER_WINDOW_SECONDS = int(os.getenv("CIRCUIT_BREAKER_WINDOW_SECONDS", "30"))
+CIRCUIT_BREAKER_HALF_OPEN_PROBES = int(os.getenv("CIRCUIT_BREAKER_HALF_OPEN_PROBES", "1"))
+CIRCUIT_BREAKER_SHARED = os.getenv("CIRCUIT_BREAKER_SHARED", "false").lower() in ("1", "true", "yes")
+CIRCUIT_BREAKER_CHANNEL = "circuit:state"
+
+# Model routing table (YAML or JSON, see app/backends/routing.py); the
+# built-in defaults apply when unset. The file is re-read when it changes.
+ROUTING_CONFIG_PATH = os.getenv("ROUTING_CONFIG_PATH", "")
+ROUTING_RELOAD_INTERVAL_SECONDS = float(os.getenv("ROUTING_RELOAD_INTERVAL_SECONDS", "5"))
+
+# Load balancing across each provider's endpoints. BACKEND_ENDPOINTS is JSON,
+# e.g. {"local": [{"name": "a"}, {"name": "b"}],
+#       "openai": [{"name": "us", "api_key_env": "OPENAI_API_KEY_US", "base_url": "..."}]};
+# providers not listed get a single default endpoint
+BACKEND_ENDPOINTS = os.getenv("BACKEND_ENDPOINTS", "")
+LOAD_BALANCER_STRATEGY = os.getenv("LOAD_BALANCER_STRATEGY", "ewma")
+LOAD_BALANCER_EWMA_DECAY_SECONDS = float(os.getenv("LOAD_BALANCER_EWMA_DECAY_SECONDS", "10"))
+
+# Per-provider bulkheads: concurrent backend calls, and how many more may
+# wait (and for how long) before requests are shed with a 503.
+# BULKHEAD_LIMITS overrides per provider, e.g. {"openai": {"max_concurrent": 128}}
+BULKHEAD_MAX_CONCURRENT = int(os.getenv("BULKHEAD_MAX_CONCURRENT", "64"))
+BULKHEAD_MAX_QUEUE = int(os.getenv("BULKHEAD_MAX_QUEUE", "128"))
+BULKHEAD_QUEUE_TIMEOUT_SECONDS = float(os.getenv("BULKHEAD_QUEUE_TIMEOUT_SECONDS", "2"))
+BULKHEAD_LIMITS = os.getenv("BULKHEAD_LIMITS", "")
+# Waiting calls are served in weighted fair order across tenants; a tenant's
+# weight is its policy's scheduling_weight, or this default
+BULKHEAD_MAX_QUEUE_PER_TENANT = int(os.getenv("BULKHEAD_MAX_QUEUE_PER_TENANT", "32"))
+SCHEDULER_DEFAULT_WEIGHT = float(os.getenv("SCHEDULER_DEFAULT_WEIGHT", "1"))
+
+# Pooled HTTP transports, one per provider and shared by its endpoints.
+# HTTP_POOL_LIMITS overrides per provider, e.g. {"openai": {"max_connections": 200}}.
+# HTTP/2 is used when enabled and the "http2" extra is installed.
+HTTP_POOL_MAX_CONNECTIONS = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "100"))
+HTTP_POOL_MAX_KEEPALIVE = int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "60"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() in ("1", "true", "yes")
+HTTP_POOL_LIMITS = os.getenv("HTTP_POOL_LIMITS", "")
+# Connections opened per endpoint at startup, and how long startup waits for them
+HTTP_WARMUP_CONNECTIONS = int(os.getenv("HTTP_WARMUP_CONNECTIONS", "4"))
+HTTP_WARMUP_TIMEOUT_SECONDS = float(os.getenv("HTTP_WARMUP_TIMEOUT_SECONDS", "5"))
+HTTP_POOL_METRICS_INTERVAL_SECONDS = float(os.getenv("HTTP_POOL_METRICS_INTERVAL_SECONDS", "5"))
+
+# Hedged requests: if the primary call is slower than the provider's
+# HEDGE_PERCENTILE latency, send a duplicate and keep whichever wins
+HEDGING_ENABLED = os.getenv("HEDGING_ENABLED", "false").lower() in ("1", "true", "yes")
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+# "fallback" hedges to the fallback backend when there is one, "same" to the primary
+HEDGE_TARGET = os.getenv("HEDGE_TARGET", "fallback")
+# At most this fraction of calls may send a hedge
+HEDGE_BUDGET_FRACTION = float(os.getenv("HEDGE_BUDGET_FRACTION", "0.05"))
+# No hedging until a provider has this many latency samples
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "50"))
+HEDGE_MIN_DELAY_MS = float(os.getenv("HEDGE_MIN_DELAY_MS", "20"))
+
+# End-to-end request deadline: clients may ask for less (X-Request-Timeout-Ms
+# header or timeout_ms field), never more than the max
+REQUEST_DEADLINE_DEFAULT_SECONDS = float(os.getenv("REQUEST_DEADLINE_DEFAULT_SECONDS", "30"))
+REQUEST_DEADLINE_MAX_SECONDS = float(os.getenv("REQUEST_DEADLINE_MAX_SECONDS", "60"))
+
+# Retries per provider are capped at this fraction of first attempts
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.1"))
+RETRY_BUDGET_MIN_RETRIES = int(os.getenv("RETRY_BUDGET_MIN_RETRIES", "10"))
+
+# /v1/predict/batch: items per call, and misses run against backends at once
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "256"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+
+# Request coalescing on cache misses
+LOCK_WAIT_TIMEOUT_SECONDS = float(os.getenv("LOCK_WAIT_TIMEOUT_SECONDS", "30"))
+CACHE_READY_CHANNEL = "cache:ready"
+
+# In-process L1 response cache in front of Redis
+L1_CACHE_MAX_BYTES = int(os.getenv("L1_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+L1_CACHE_TTL_SECONDS = float(os.getenv("L1_CACHE_TTL_SECONDS", "30"))
+CACHE_INVALIDATION_CHANNEL = "cache:invalidate"
+
+# Cache values with outputs at least this large are zlib-compressed
+CACHE_COMPRESSION_MIN_BYTES = int(os.getenv("CACHE_COMPRESSION_MIN_BYTES", "512"))
+CACHE_COMPRESSION_LEVEL = int(os.getenv("CACHE_COMPRESSION_LEVEL", "6"))
+
+# Semantic (near-duplicate prompt) cache, opted into per request
+SEMANTIC_CACHE_EMBEDDER = os.getenv("SEMANTIC_CACHE_EMBEDDER", "hashing")
+SEMANTIC_CACHE_DIM = int(os.getenv("SEMANTIC_CACHE_DIM", "512"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))
+# Vector memory across all namespaces; least recently used namespaces go first
+SEMANTIC_CACHE_MAX_BYTES = int(os.getenv("SEMANTIC_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Rate limiting: "sliding_window" or "token_bucket"
+RATE_LIMIT_ALGORITHM = os.getenv("RATE_LIMIT_ALGORITHM", "sliding_window")
+RATE_LIMIT_WINDOW_SECONDS = 60
+# "strict" (one Redis call per request) or "local" (leased quota, see LocalQuota)
+RATE_LIMIT_MODE = os.getenv("RATE_LIMIT_MODE", "strict")
+RATE_LIMIT_LOCAL_TENANTS = frozenset(
+    t.strip() for t in os.getenv("RATE_LIMIT_LOCAL_TENANTS", "").split(",") if t.strip()
+)
+RATE_LIMIT_LEASE_FRACTION = float(os.getenv("RATE_LIMIT_LEASE_FRACTION", "0.05"))
+RATE_LIMIT_LEASE_TTL_SECONDS = float(os.getenv("RATE_LIMIT_LEASE_TTL_SECONDS", "2"))
+# Tokens-per-minute quota for tenants without one in their policy (0 = none)
+DEFAULT_TOKENS_PER_MIN = int(os.getenv("DEFAULT_TOKENS_PER_MIN", "0"))
+# Upper bound on how long a crashed request can hold a concurrency slot
+CONCURRENCY_SLOT_TTL_SECONDS = 120
+
+# Rate limit policies are cached in memory and reloaded on change
+POLICY_REFRESH_SECONDS = float(os.getenv("POLICY_REFRESH_SECONDS", "60"))
+POLICY_CHANGED_CHANNEL = "policy:changed"
+
+# Token usage accounting: Redis counters, flushed to usage_records
+USAGE_PERIOD_SECONDS = int(os.getenv("USAGE_PERIOD_SECONDS", "3600"))
+USAGE_FLUSH_INTERVAL_SECONDS = float(os.getenv("USAGE_FLUSH_INTERVAL_SECONDS", "30"))
+# Hash-tagged so the flusher's RENAME stays within one Cluster slot
+USAGE_PENDING_KEY = "{usage}:pending"
+
+# Micro-batching for the local backend: a batch is dispatched when it is
+# full or when its oldest request has waited LOCAL_BATCH_MAX_WAIT_MS
+LOCAL_BATCH_MAX_SIZE = int(os.getenv("LOCAL_BATCH_MAX_SIZE", "16"))
+LOCAL_BATCH_MAX_WAIT_MS = float(os.getenv("LOCAL_BATCH_MAX_WAIT_MS", "10"))
+
+# Expose per-stage request timings in a Server-Timing header (internal use)
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() in ("1", "true", "yes")
+
+# API key auth cache
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_NEGATIVE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_NEGATIVE_TTL_SECONDS", "5"))
+AUTH_INVALIDATION_CHANNEL = "auth:invalidate"
+
+# Write-behind buffer for api_keys.last_used_at
+LAST_USED_FLUSH_INTERVAL_SECONDS = float(os.getenv("LAST_USED_FLUSH_INTERVAL_SECONDS", "5"))
 
 
 def get_database_url() -> str:
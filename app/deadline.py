@@ -0,0 +1,72 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastapi import HTTPException, status
+
+from app.config import REQUEST_DEADLINE_DEFAULT_SECONDS, REQUEST_DEADLINE_MAX_SECONDS
+from app.metrics import DEADLINE_EXCEEDED
+
+# Monotonic time by which the current request must be answered
+_deadline: ContextVar[float | None] = ContextVar("request_deadline", default=None)
+# Monotonic time by which the backend call in progress must answer, by its route's limit
+_call_deadline: ContextVar[float | None] = ContextVar("call_deadline", default=None)
+
+
+def start_deadline(timeout_ms: int | None) -> float:
+    """Set the current request's deadline; returns its budget in seconds.
+
+    The client's timeout (header or body) is capped by
+    REQUEST_DEADLINE_MAX_SECONDS; without one REQUEST_DEADLINE_DEFAULT_SECONDS
+    applies. Tasks created afterwards inherit the deadline.
+    """
+    seconds = REQUEST_DEADLINE_DEFAULT_SECONDS if timeout_ms is None else timeout_ms / 1000
+    seconds = min(max(seconds, 0.0), REQUEST_DEADLINE_MAX_SECONDS)
+    _deadline.set(time.monotonic() + seconds)
+    return seconds
+
+
+def remaining() -> float | None:
+    """Seconds left before the deadline, or None outside a request."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def budget(limit: float) -> float:
+    """`limit`, cut down to whatever time the request has left."""
+    left = remaining()
+    return limit if left is None else max(0.0, min(limit, left))
+
+
+@contextmanager
+def call_limit(limit: float):
+    """Time one backend call against `limit`; yields `budget(limit)`."""
+    token = _call_deadline.set(time.monotonic() + limit)
+    try:
+        yield budget(limit)
+    finally:
+        _call_deadline.reset(token)
+
+
+def call_overran() -> bool:
+    """Whether the backend call in progress ran past its own limit.
+
+    Lets code under the call tell a timeout (cancelled at the limit) from
+    a call that was abandoned early, by a lost hedge or a client deadline.
+    """
+    limit = _call_deadline.get()
+    return limit is not None and time.monotonic() >= limit
+
+
+def expired(stage: str) -> HTTPException:
+    DEADLINE_EXCEEDED.labels(stage=stage).inc()
+    return HTTPException(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        detail=f"Request deadline exceeded ({stage})",
+    )
+
+
+def check(stage: str):
+    left = remaining()
+    if left is not None and left <= 0:
+        raise expired(stage)
@@ -0,0 +1,72 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import structlog
+
+from app.config import LAST_USED_FLUSH_INTERVAL_SECONDS
+from app.db import async_session_maker
+from app.metrics import (
+    LAST_USED_BUFFER_SIZE,
+    LAST_USED_FLUSH_LATENCY,
+    LAST_USED_FLUSH_FAILURES,
+)
+from app.repositories import touch_api_keys_used
+
+logger = structlog.get_logger()
+
+
+class LastUsedBuffer:
+    """Coalesces api_keys.last_used_at writes off the request path.
+
+    `record` only keeps the latest timestamp per key in memory; `flush`
+    writes everything pending in one bulk UPDATE.
+    """
+
+    def __init__(self):
+        self._pending: dict = {}
+
+    def record(self, api_key_id, used_at: datetime | None = None):
+        self._pending[api_key_id] = used_at or datetime.now(timezone.utc)
+        LAST_USED_BUFFER_SIZE.set(len(self._pending))
+
+    async def flush(self):
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, {}
+        LAST_USED_BUFFER_SIZE.set(0)
+        start_time = time.perf_counter()
+
+        try:
+            async with async_session_maker() as db:
+                await touch_api_keys_used(db, batch)
+                await db.commit()
+        except Exception as e:
+            LAST_USED_FLUSH_FAILURES.inc()
+            logger.warning("last_used_flush_failed", keys=len(batch), error=str(e))
+            # Put the batch back, keeping anything newer recorded meanwhile.
+            for api_key_id, used_at in batch.items():
+                newer = self._pending.get(api_key_id)
+                if newer is None or newer < used_at:
+                    self._pending[api_key_id] = used_at
+            LAST_USED_BUFFER_SIZE.set(len(self._pending))
+            return
+        finally:
+            LAST_USED_FLUSH_LATENCY.observe(time.perf_counter() - start_time)
+
+    def __len__(self):
+        return len(self._pending)
+
+
+last_used_buffer = LastUsedBuffer()
+
+
+async def run_last_used_flusher(interval: float = LAST_USED_FLUSH_INTERVAL_SECONDS):
+    """Background task: flush every `interval` seconds, and once more on shutdown."""
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            await last_used_buffer.flush()
+    finally:
+        await last_used_buffer.flush()
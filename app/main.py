@@ -1,20 +1,49 @@
+import contextlib
+from contextlib import asynccontextmanager
 from typing import Annotated
 
-from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from prometheus_client import make_asgi_app
 
 from app.db import db_ping, redis_ping
 # from app.deps import get_current_api_key
 from app.auth import require_api_key, AuthContext
+from app.auth_cache import listen_for_invalidations
+from app.last_used import run_last_used_flusher
 from app.models.api_key import ApiKey
-from app.rate_limit import check_rate_limit
-from app.cache import build_cache_key, cache_get, cache_set, acquire_lock, release_lock
+from app.rate_limit import (
+    check_rate_limit,
+    check_rate_limit_and_cache,
+    acquire_concurrency_slot,
+    release_concurrency_slot,
+    reserve_tokens,
+    settle_tokens,
+)
+from app.usage import record_usage, run_usage_flusher
+from app.policies import policy_cache, run_policy_refresher
+from app.cache import (
+    build_cache_key,
+    cache_get,
+    cache_set,
+    cache_get_many,
+    cache_set_many,
+    encode_cache_value,
+    decode_cache_value,
+    listen_for_cache_invalidations,
+)
+from app.semantic_cache import semantic_cache
+from app.single_flight import run_single_flight, listen_for_cache_ready
 from app.config import (
+    BATCH_MAX_ITEMS,
+    BATCH_MAX_CONCURRENCY,
+    HEDGE_TARGET,
+    HTTP_WARMUP_CONNECTIONS,
+    HTTP_WARMUP_TIMEOUT_SECONDS,
     INFERENCE_TIMEOUT_SECONDS,
-    MAX_RETRIES,
-    RETRY_BACKOFF_BASE
+    SERVER_TIMING_ENABLED,
 )
 from app.metrics import (
     REQUEST_COUNT, 
@@ -26,9 +55,20 @@ from app.metrics import (
     PROVIDER_FAILURES,
     RETRY_COUNT,
     TIMEOUT_COUNT,
-    FALLBACK_ATTEMPTS
+    FALLBACK_ATTEMPTS,
+    BATCH_PREDICT_ITEMS,
+    PROVIDER_REJECTIONS,
+    RETRY_BUDGET_EXHAUSTED,
 )
 from app.backends.router import BackendRouter
+from app.backends.base import Usage, estimate_tokens
+from app.backends.hedging import run_hedged
+from app.backends.retries import backoff_delay
+from app import deadline
+from app.timing import ServerTimingMiddleware, stage
+from app.backends.circuit_breaker import listen_for_breaker_changes
+from app.backends.routing import watch_routing_config
+from app.backends.transport import run_pool_metrics, close_http_clients
 from app.logging_config import configure_logging
 
 
@@ -39,9 +79,36 @@ import structlog
 import uuid
 import random
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    background_tasks = [
+        asyncio.create_task(listen_for_invalidations()),
+        asyncio.create_task(run_last_used_flusher()),
+        asyncio.create_task(listen_for_cache_ready()),
+        asyncio.create_task(listen_for_cache_invalidations()),
+        asyncio.create_task(run_policy_refresher()),
+        asyncio.create_task(run_usage_flusher()),
+        asyncio.create_task(listen_for_breaker_changes()),
+        asyncio.create_task(watch_routing_config(router)),
+        asyncio.create_task(run_pool_metrics()),
+    ]
+    try:
+        # Connections not ready in time are opened by the first requests instead
+        await asyncio.wait_for(router.warm_up(HTTP_WARMUP_CONNECTIONS), HTTP_WARMUP_TIMEOUT_SECONDS)
+    except Exception as e:
+        logger.warning("provider_warmup_failed", error=str(e))
+    try:
+        yield
+    finally:
+        for task in background_tasks:
+            task.cancel()
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+        await close_http_clients()
+
 app = FastAPI(
     title="AI Inference Gateway",
-    version="0.1.8" # 0.1.8 Structured logging, 0.1.7 Backend router, 0.1.6 Metrics and monitoring, 0.1.5 Cache locking, 0.1.4 Cache bypass, 0.1.3 Rate limiting, 0.1.2 Health checks, 0.1.1 API key auth, 0.1.0 Initial version
+    version="0.1.10", # 0.1.10 Streaming, 0.1.9 Auth cache, 0.1.8 Structured logging, 0.1.7 Backend router, 0.1.6 Metrics and monitoring, 0.1.5 Cache locking, 0.1.4 Cache bypass, 0.1.3 Rate limiting, 0.1.2 Health checks, 0.1.1 API key auth, 0.1.0 Initial version
+    lifespan=lifespan,
 )
 
 origins = [
@@ -56,6 +123,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if SERVER_TIMING_ENABLED:
+    # Per-stage latency in a Server-Timing response header (used by bench/)
+    app.add_middleware(ServerTimingMiddleware)
+
 metrics_app = make_asgi_app()
 
 # initialize backend
@@ -71,6 +142,9 @@ class PredictRequest(BaseModel):
     temperature: float = 0.0
     max_tokens: int = 100
     cache_bypass: bool = False
+    semantic_cache: bool = False
+    # How long the client will wait; the X-Request-Timeout-Ms header also works
+    timeout_ms: int | None = None
 
 class PredictResponse(BaseModel):
     output: str
@@ -80,6 +154,25 @@ class PredictResponse(BaseModel):
     fallback_used: bool
     cache_hit: bool
 
+class BatchPredictRequest(BaseModel):
+    items: list[PredictRequest] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+    # Deadline for the whole batch; per-item timeout_ms is ignored
+    timeout_ms: int | None = None
+
+class BatchItemResult(BaseModel):
+    index: int
+    status_code: int = 200
+    output: str | None = None
+    backend: str | None = None
+    retries: int = 0
+    fallback_used: bool = False
+    cache_hit: bool = False
+    error: str | None = None
+
+class BatchPredictResponse(BaseModel):
+    results: list[BatchItemResult]
+    latency_ms: float
+
 @app.get("/healthz")
 def healthz():
     return {"status": "ok"}
@@ -93,34 +186,63 @@ async def readyz():
 
 async def _execute_with_resilience(
         backend,
-        fallback_backend,
+        fallbacks,
         req,
         tenant: str,
 ):
+    """Call `backend` with retries, then each of `fallbacks` in turn."""
     last_exception = None
     fallback_used = False
     retries = 0
 
-    print(f"Executing with resilience: backend={backend}, fallback={fallback_backend}, tenant={tenant}")
-    for attempt in range(MAX_RETRIES):
+    route = router.route_for(req.model)
+
+    # Calls that reached a provider in the current attempt; a hedge that
+    # lost was still billed for its prompt
+    sent = []
+
+    async def call(target):
+        # A provider slot per call (attempt, hedge or fallback), so a hedge
+        # is capped and scheduled like any call and backoffs hold no slot
+        async with _bulkhead(target, tenant):
+            sent.append(target)
+            return await _guarded(target, target.predict_with_usage(
+                prompt=req.prompt,
+                model=req.model,
+                temperature=req.temperature,
+                max_tokens=req.max_tokens,
+            ), timeout=route.timeout_seconds)
+
+    # Slow primary calls may be hedged (see app/backends/hedging.py)
+    hedge_backend = fallbacks[0] if HEDGE_TARGET == "fallback" and fallbacks else backend
+    for attempt in range(route.max_retries):
+        if not _may_attempt(backend, attempt):
+            break
+        if attempt > 0 and not await _backoff(attempt - 1):
+            break
+        sent.clear()
         try:
-            output = await asyncio.wait_for(
-                backend.predict(
-                    prompt=req.prompt,
-                    model=req.model,
-                    temperature=req.temperature,
-                    max_tokens=req.max_tokens,
-                ),
-                timeout=INFERENCE_TIMEOUT_SECONDS
-            )
+            (output, usage), winner = await run_hedged(backend, hedge_backend, call, can_hedge=_has_capacity)
+            if len(sent) > 1:
+                usage = Usage(
+                    usage.prompt_tokens + estimate_tokens(req.prompt) * (len(sent) - 1),
+                    usage.completion_tokens,
+                    estimated=True,
+                )
 
             return {
                 "output" : output,
                 "retries": retries,
-                "fallback_used": fallback_used,
-                "backend_name": backend.__class__.__name__
+                "fallback_used": winner is not backend,
+                "backend_name": winner.name,
+                "usage": usage,
             }
 
+        except HTTPException as e:
+            # Shed by the bulkhead or refused by the circuit: retrying the
+            # same provider won't help, the fallback might
+            last_exception = e
+            break
         except asyncio.TimeoutError:
             retries += 1
             TIMEOUT_COUNT.labels(tenant_id=tenant).inc()
@@ -130,75 +252,366 @@ async def _execute_with_resilience(
             retries += 1
             RETRY_COUNT.labels(tenant_id=tenant).inc()
             last_exception = e
-        
-        await asyncio.sleep(RETRY_BACKOFF_BASE * (2 ** attempt))
 
-    if fallback_backend:
+    for fallback_backend in fallbacks:
+        if not _has_time_left():
+            break
+        if not _circuit_allows(fallback_backend):
+            continue
         fallback_used = True
         FALLBACK_ATTEMPTS.labels(tenant_id=tenant).inc()
-        print(f"Attempting fallback: backend={fallback_backend}, tenant={tenant}")
         try:
-            output = await asyncio.wait_for(
-                fallback_backend.predict(
-                    prompt=req.prompt,
-                    model=req.model,
-                    temperature=req.temperature,
-                    max_tokens=req.max_tokens
-                ),
-                timeout=INFERENCE_TIMEOUT_SECONDS
-            )
+            output, usage = await call(fallback_backend)
 
             return {
                 "output" : output,
                 "retries": retries,
                 "fallback_used": fallback_used,
-                "backend_name": fallback_backend.__class__.__name__
+                "backend_name": fallback_backend.name,
+                "usage": usage,
             }
         except Exception as e:
             last_exception = e
     
+    if not _has_time_left():
+        raise deadline.expired("inference")
     raise last_exception
 
 
+def _has_time_left() -> bool:
+    left = deadline.remaining()
+    return left is None or left > 0
+
+
+def _may_attempt(backend, attempt: int) -> bool:
+    """Whether attempt number `attempt` on `backend` should go ahead."""
+    if not _has_time_left():
+        return False
+    budget = router.retry_budget_for(backend)
+    if attempt == 0:
+        # The router already admitted the first attempt
+        if budget is not None:
+            budget.deposit()
+        return True
+    # Stop retrying into an open circuit
+    if not _circuit_allows(backend):
+        return False
+    if budget is not None and not budget.try_withdraw():
+        RETRY_BUDGET_EXHAUSTED.labels(provider=router.provider_of(backend)).inc()
+        return False
+    return True
+
+
+async def _backoff(attempt: int) -> bool:
+    """Sleep a jittered backoff; False if the deadline leaves no time for another try."""
+    delay = backoff_delay(attempt)
+    left = deadline.remaining()
+    if left is not None and left <= delay:
+        return False
+    await asyncio.sleep(delay)
+    return True
+
+
+def _bulkhead(backend, tenant: str | None = None):
+    """The provider's bulkhead slot, queued fairly under `tenant`."""
+    bulkhead = router.bulkhead_for(backend)
+    if bulkhead is None:
+        return contextlib.nullcontext()
+    return bulkhead.slot(tenant, policy_cache.scheduling_weight(tenant))
+
+
+def _has_capacity(backend) -> bool:
+    """Whether `backend`'s bulkhead would take a call now without queueing."""
+    bulkhead = router.bulkhead_for(backend)
+    return bulkhead is None or bulkhead.has_capacity()
+
+
+class _BulkheadStream:
+    """A backend stream that holds its provider's bulkhead slot until closed."""
+
+    def __init__(self, stream, bulkhead):
+        self._stream = stream
+        self._bulkhead = bulkhead
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self._stream.__anext__()
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._bulkhead is not None:
+                self._bulkhead.release()
+                self._bulkhead = None
+
+
+def _circuit_allows(backend) -> bool:
+    """Whether `backend`'s circuit would admit a call; takes no probe slot."""
+    breaker = router.breaker_for(backend)
+    if breaker is None or breaker.is_available():
+        return True
+    PROVIDER_REJECTIONS.labels(provider=breaker.name).inc()
+    return False
+
+
+async def _guarded(backend, call, timeout: float = INFERENCE_TIMEOUT_SECONDS):
+    """Await one backend call with a timeout, recording the outcome on its circuit breaker.
+
+    Cancellation (a hedge that lost, a client that went away) says nothing
+    about the backend's health and is not recorded. `timeout` is the route's
+    limit, cut down to the request's deadline; a timeout that only hit the
+    client's deadline is not recorded either, so clients sending tiny
+    deadlines cannot trip a healthy provider's circuit.
+
+    The breaker's go-ahead (a half-open probe slot) is taken here, as the
+    call is about to run, and handed back when the call ends without an
+    outcome worth recording.
+    """
+    breaker = router.breaker_for(backend)
+    if breaker is not None and not breaker.allow_request():
+        call.close()
+        PROVIDER_REJECTIONS.labels(provider=breaker.name).inc()
+        raise HTTPException(status_code=503, detail=f"{breaker.name} backend temporarily unavailable")
+    with deadline.call_limit(timeout) as budget:
+        try:
+            result = await asyncio.wait_for(call, timeout=budget)
+        except asyncio.TimeoutError:
+            if breaker is not None:
+                if budget >= timeout:
+                    breaker.record_failure()
+                else:
+                    breaker.release_probe()
+            raise
+        except Exception:
+            if breaker is not None:
+                breaker.record_failure()
+            raise
+        except BaseException:
+            if breaker is not None:
+                breaker.release_probe()
+            raise
+    if breaker is not None:
+        breaker.record_success()
+    return result
+
+
+async def _open_stream(backend, req, timeout: float = INFERENCE_TIMEOUT_SECONDS, tenant: str | None = None):
+    """Start `backend.predict_stream` and wait for its first chunk.
+
+    The provider's bulkhead slot is held until the returned stream is closed.
+    """
+    bulkhead = router.bulkhead_for(backend)
+    if bulkhead is not None:
+        await bulkhead.acquire(tenant, policy_cache.scheduling_weight(tenant))
+    stream = _BulkheadStream(backend.predict_stream(
+        prompt=req.prompt,
+        model=req.model,
+        temperature=req.temperature,
+        max_tokens=req.max_tokens,
+    ), bulkhead)
+    try:
+        first_chunk = await _guarded(backend, anext(stream, ""), timeout=timeout)
+    except BaseException:
+        await stream.aclose()
+        raise
+    return first_chunk, stream
+
+
+async def _start_stream_with_resilience(
+        backend,
+        fallbacks,
+        req,
+        tenant: str,
+):
+    """Streaming counterpart of `_execute_with_resilience`.
+
+    Retries and fallback only apply until the first chunk is emitted; once
+    output has reached the client a failure ends the stream instead.
+    """
+    last_exception = None
+    fallback_used = False
+    retries = 0
+    route = router.route_for(req.model)
+
+    for attempt in range(route.max_retries):
+        if not _may_attempt(backend, attempt):
+            break
+        if attempt > 0 and not await _backoff(attempt - 1):
+            break
+        try:
+            first_chunk, stream = await _open_stream(backend, req, route.timeout_seconds, tenant)
+            return {
+                "first_chunk": first_chunk,
+                "stream": stream,
+                "retries": retries,
+                "fallback_used": fallback_used,
+                "backend_name": backend.name
+            }
+        except HTTPException as e:
+            # Shed or refused: go straight to the fallbacks
+            last_exception = e
+            break
+        except asyncio.TimeoutError:
+            retries += 1
+            TIMEOUT_COUNT.labels(tenant_id=tenant).inc()
+            RETRY_COUNT.labels(tenant_id=tenant).inc()
+            last_exception = Exception("backend_timeout")
+        except Exception as e:
+            retries += 1
+            RETRY_COUNT.labels(tenant_id=tenant).inc()
+            last_exception = e
+
+    for fallback_backend in fallbacks:
+        if not _has_time_left():
+            break
+        if not _circuit_allows(fallback_backend):
+            continue
+        fallback_used = True
+        FALLBACK_ATTEMPTS.labels(tenant_id=tenant).inc()
+        try:
+            first_chunk, stream = await _open_stream(fallback_backend, req, route.timeout_seconds, tenant)
+            return {
+                "first_chunk": first_chunk,
+                "stream": stream,
+                "retries": retries,
+                "fallback_used": fallback_used,
+                "backend_name": fallback_backend.name
+            }
+        except Exception as e:
+            last_exception = e
+
+    if not _has_time_left():
+        raise deadline.expired("stream_start")
+    raise last_exception
+
+
+def _request_params(req) -> dict:
+    return {
+        "temperature": req.temperature,
+        "max_tokens": req.max_tokens
+    }
+
+
+async def _admit(req, tenant: str, api_key_id: str):
+    """Rate limit a request and, unless it bypasses the cache, look it up.
+
+    Returns (rate_limit, cache_key, cached value or None); the common path
+    is a single Redis round trip (see check_rate_limit_and_cache).
+    """
+    cache_key = _build_request_cache_key(req, tenant)
+    with stage("admit"):
+        if req.cache_bypass:
+            return await check_rate_limit(tenant, api_key_id), cache_key, None
+        rate_limit, cached = await check_rate_limit_and_cache(tenant, api_key_id, cache_key)
+    return rate_limit, cache_key, cached
+
+
+def _build_request_cache_key(req, tenant: str) -> str:
+    return build_cache_key(
+        tenant_id=tenant,
+        model=req.model,
+        prompt=req.prompt,
+        params=_request_params(req)
+    )
+
+
+async def _semantic_lookup(req, tenant: str):
+    """Find the cached value of a near-duplicate prompt.
+
+    Returns (cached_value_or_None, namespace, vector); the caller indexes
+    the vector under its own cache key once it has a result.
+    """
+    namespace = semantic_cache.namespace(tenant, req.model, _request_params(req))
+    with stage("semantic_embed"):
+        vector = await semantic_cache.embed(req.prompt)
+
+    similar_key = semantic_cache.lookup(namespace, vector)
+    if similar_key is None:
+        return None, namespace, vector
+
+    cached = await cache_get(similar_key)
+    if not cached:
+        # Exact entry expired; stop matching against it
+        semantic_cache.remove(namespace, similar_key)
+    return cached, namespace, vector
+
+
+async def _run_metered(tenant: str, req, response: Response | None, run):
+    """Run an inference under the tenant's token quota and record its usage.
+
+    The worst case (prompt estimate + max_tokens) is reserved up front and
+    settled against the provider's reported usage afterwards. Results
+    served by another request (coalesced) consumed no tokens.
+    """
+    reservation = await reserve_tokens(tenant, estimate_tokens(req.prompt) + req.max_tokens)
+    if reservation is not None and response is not None:
+        response.headers.update(reservation.result.headers())
+
+    try:
+        with stage("inference"):
+            result = await run()
+    except BaseException:
+        await settle_tokens(reservation, 0)
+        raise
+
+    usage = None if result.get("cache_hit") else result["usage"]
+    await _account_usage(tenant, req, usage, reservation)
+    return result
+
+
+async def _account_usage(tenant: str, req, usage: Usage | None, reservation):
+    if usage is None:
+        await settle_tokens(reservation, 0)
+        return
+    await asyncio.gather(
+        settle_tokens(reservation, usage.total_tokens),
+        record_usage(tenant, req.model, usage),
+    )
+
+
+def _sse_event(data: dict, event: str | None = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
 @app.post("/v1/predict", response_model=PredictResponse)
 async def predict(
     req: PredictRequest,
+    response: Response,
     auth: AuthContext = Depends(require_api_key),
+    x_request_timeout_ms: Annotated[int | None, Header()] = None,
 ):
     tenant = str(auth.tenant_id)
     start_time = time.time()
+    deadline.start_deadline(req.timeout_ms or x_request_timeout_ms)
     cache_hit = False
 
-    # Route to backend
-    backend, breaker, provider, fallback = router.get_backend_for_model(req.model)
-    backend_name = backend.__class__.__name__
-    print(f"Routed request to backend: {backend_name}, provider: {provider}, fallback: {fallback}")
+    # Unknown models fail fast; the circuit is only consulted on a cache miss
+    provider = router.route_for(req.model).provider
+    slot = None
 
     try:
-        # Rate limit check
-        await check_rate_limit(tenant, str(auth.api_key_id))
-
-        # Build cache key
-        params = {
-            "temperature": req.temperature,
-            "max_tokens": req.max_tokens
-        }
-
-        cache_key = build_cache_key(
-            tenant_id=tenant,
-            model=req.model,
-            prompt=req.prompt,
-            params=params
-        )
+        # Rate limit check and cache lookup, in one Redis round trip
+        rate_limit, cache_key, cached = await _admit(req, tenant, str(auth.api_key_id))
+        response.headers.update(rate_limit.headers())
+        with stage("concurrency_slot"):
+            slot = await acquire_concurrency_slot(tenant, str(auth.api_key_id))
 
         # Try cache first
+        semantic_namespace = semantic_vector = None
         if not req.cache_bypass:
-            cached = await cache_get(cache_key)
+            if not cached and req.semantic_cache and semantic_cache is not None:
+                cached, semantic_namespace, semantic_vector = await _semantic_lookup(req, tenant)
+
             if cached:
                 cache_hit = True
                 CACHE_HITS.labels(tenant_id=tenant).inc()
-                response_data = json.loads(cached)
+                response_data = decode_cache_value(cached)
                 print(response_data)
+                backend_name = response_data["backend_name"]
 
                 _record_success_metrics(tenant, start_time)
                 
@@ -213,30 +626,39 @@ async def predict(
 
             CACHE_MISSES.labels(tenant_id=tenant).inc()
 
+        # Route to backend
+        backend, breaker, provider, fallbacks = router.get_backend_for_model(req.model)
+        backend_name = backend.name
+        print(f"Routed request to backend: {backend_name}, provider: {provider}, fallbacks: {fallbacks}")
+
+        if not req.cache_bypass:
             # Prevent thundering herd
-            result = await _run_with_lock(
+            result = await _run_metered(tenant, req, response, lambda: _run_with_lock(
                 cache_key=cache_key,
                 backend=backend,
-                fallback_backend=fallback,
+                fallbacks=fallbacks,
                 req=req,
                 tenant=tenant,
                 backend_name=backend_name
-            )
+            ))
             output = result["output"]
             retries = result["retries"]
             fallback_used = result["fallback_used"]
             backend_name = result["backend_name"]
-            
+            cache_hit = result["cache_hit"]
+
+            if semantic_vector is not None:
+                semantic_cache.add(semantic_namespace, semantic_vector, cache_key)
 
         else:
             #  Direct inference (cache bypass) - no cache read or write
             # Replace with resilient execution that includes retries and fallback
-            result = await _execute_with_resilience(
+            result = await _run_metered(tenant, req, response, lambda: _execute_with_resilience(
                 backend=backend,
-                fallback_backend=fallback,
+                fallbacks=fallbacks,
                 req=req,
                 tenant=tenant
-            )
+            ))
             output = result["output"]
             retries = result["retries"]
             fallback_used = result["fallback_used"]
@@ -300,76 +722,435 @@ async def predict(
         )
         raise
 
-async def _run_with_lock(
-    cache_key: str,
-    backend,
-    fallback_backend,
+    finally:
+        await release_concurrency_slot(slot)
+
+@app.post("/v1/predict/stream")
+async def predict_stream(
     req: PredictRequest,
-    tenant: str,
-    backend_name: str,
+    auth: AuthContext = Depends(require_api_key),
+    x_request_timeout_ms: Annotated[int | None, Header()] = None,
 ):
-    lock_key = f"lock:{cache_key}"
-    acquired = await acquire_lock(lock_key)
-    cache_hit = False
+    """Server-Sent Events variant of /v1/predict.
 
-    if not acquired:
-        # Wait for other request to populate cache
-        for _ in range(20):
-            await asyncio.sleep(0.1)
-            cached = await cache_get(cache_key)
+    Emits `data: {"delta": ...}` events as output is generated, then a final
+    `event: done` carrying the same metadata as PredictResponse. Cache hits
+    are replayed as a stream and completed streams are written to the cache.
+    The request deadline covers everything up to the first chunk.
+    """
+    tenant = str(auth.tenant_id)
+    deadline.start_deadline(req.timeout_ms or x_request_timeout_ms)
+    start_time = time.time()
+
+    # Unknown models fail fast; the circuit is only consulted on a cache miss
+    provider = router.route_for(req.model).provider
+    lease = _StreamLease(tenant, req)
+
+    try:
+        rate_limit, cache_key, cached = await _admit(req, tenant, str(auth.api_key_id))
+        with stage("concurrency_slot"):
+            lease.slot = await acquire_concurrency_slot(tenant, str(auth.api_key_id))
+
+        extra_headers = rate_limit.headers()
+        semantic_namespace = semantic_vector = None
+        if not req.cache_bypass:
+            if not cached and req.semantic_cache and semantic_cache is not None:
+                cached, semantic_namespace, semantic_vector = await _semantic_lookup(req, tenant)
             if cached:
-                cache_hit = True
                 CACHE_HITS.labels(tenant_id=tenant).inc()
-                return json.loads(cached)["output"]
+            else:
+                CACHE_MISSES.labels(tenant_id=tenant).inc()
 
-        # Fallback: no cache populated
-        # replace with resilient execution that includes retries and fallback
-        result = await _execute_with_resilience(
-                backend=backend,
-                fallback_backend=fallback_backend,
-                req=req,
-                tenant=tenant
-            )
-        
-        return {
-            "output": result["output"],
-            "retries": result["retries"],
-            "fallback_used": result["fallback_used"],
-            "cache_hit": cache_hit,
-            "backend_name": result["backend_name"]
-        }
-        # return await backend.predict(
-        #     prompt=req.prompt,
-        #     model=req.model,
-        #     temperature=req.temperature,
-        #     max_tokens=req.max_tokens,
-        # )
+        if cached:
+            response_data = decode_cache_value(cached)
+            events = _replay_cached_stream(response_data, req, tenant, response_data["backend_name"], start_time)
+        else:
+            backend, breaker, provider, fallbacks = router.get_backend_for_model(req.model)
+            lease.reservation = await reserve_tokens(tenant, estimate_tokens(req.prompt) + req.max_tokens)
+            if lease.reservation is not None:
+                extra_headers.update(lease.reservation.result.headers())
+            # Errors before the first chunk still surface as a regular HTTP error
+            try:
+                with stage("stream_start"):
+                    started = await _start_stream_with_resilience(
+                        backend=backend,
+                        fallbacks=fallbacks,
+                        req=req,
+                        tenant=tenant
+                    )
+            except BaseException:
+                await lease.release()
+                raise
+            lease.stream = started["stream"]
+            started["first_chunk"] = lease.record(started["first_chunk"])
+            events = _relay_backend_stream(started, req, tenant, cache_key, provider, start_time, lease, semantic_namespace, semantic_vector)
+
+    except HTTPException as e:
+        await lease.release()
+        if e.status_code == 429:
+            RATE_LIMIT_HITS.labels(tenant_id=tenant).inc()
+
+        REQUEST_COUNT.labels(tenant_id=tenant, status="error").inc()
+        ERROR_COUNT.labels(
+            tenant_id=tenant,
+            error_type=str(e.status_code)
+        ).inc()
+
+        logger.error(
+            "inference_error",
+            tenant_id=tenant,
+            model=req.model,
+            error=str(e),
+        )
+        raise
+
+    except Exception:
+        await lease.release()
+        REQUEST_COUNT.labels(tenant_id=tenant, status="error").inc()
+        PROVIDER_FAILURES.labels(provider=provider).inc()
+        ERROR_COUNT.labels(
+            tenant_id=tenant,
+            error_type="internal"
+        ).inc()
+
+        logger.exception(
+            "inference_internal_error",
+            tenant_id=tenant,
+            model=req.model,
+        )
+        raise
+
+    return _LeasedStreamingResponse(
+        events,
+        lease,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **extra_headers},
+    )
+
+
+class _StreamLease:
+    """What a streaming response holds until it is done with.
+
+    The concurrency slot, the token reservation and the backend stream (and
+    with it the provider's bulkhead slot) are given back by `release()`,
+    whether the body was relayed in full, cut short, or never iterated at
+    all. Both steps run once however often they are called.
+    """
+
+    def __init__(self, tenant: str, req: PredictRequest):
+        self.tenant = tenant
+        self.req = req
+        self.slot = None
+        self.reservation = None
+        self.stream = None
+        self.chunks = []
+        self.usage = None
+        self._stream_closed = False
+        self._released = False
+
+    def record(self, item) -> str:
+        """Note one stream item; returns its text ("" for a usage report)."""
+        if isinstance(item, Usage):
+            self.usage = item
+            return ""
+        self.chunks.append(item)
+        return item
+
+    async def close_stream(self):
+        """Close the backend stream and account for what it generated."""
+        if self._stream_closed:
+            return
+        self._stream_closed = True
+        usage = None
+        try:
+            if self.stream is not None:
+                await self.stream.aclose()
+                # Estimated when the provider's report never arrived (or the stream was cut short)
+                usage = self.usage or Usage.estimate(self.req.prompt, "".join(self.chunks))
+        finally:
+            await _account_usage(self.tenant, self.req, usage, self.reservation)
+
+    async def release(self):
+        if self._released:
+            return
+        self._released = True
+        try:
+            await self.close_stream()
+        finally:
+            await release_concurrency_slot(self.slot)
+
+
+class _LeasedStreamingResponse(StreamingResponse):
+    """A StreamingResponse that releases its lease once it has been sent.
+
+    Releasing here rather than in the body generator's finally covers a
+    body that never starts (the client left before the first byte) or is
+    abandoned half way; the release is shielded so a cancelled response
+    still finishes it.
+    """
+
+    def __init__(self, content, lease: _StreamLease, **kwargs):
+        super().__init__(content, **kwargs)
+        self.lease = lease
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await asyncio.shield(self.lease.release())
+
+async def _replay_cached_stream(response_data: dict, req: PredictRequest, tenant: str, backend_name: str, start_time: float):
+    yield _sse_event({"delta": response_data["output"]})
+
+    _record_success_metrics(tenant, start_time)
+    logger.info(
+        "inference_success_cache",
+        tenant_id=tenant,
+        model=req.model,
+        backend=backend_name,
+    )
+    yield _sse_event({
+        "backend": backend_name,
+        "retries": 0,
+        "fallback_used": False,
+        "cache_hit": True,
+        "latency_ms": round((time.time() - start_time)*1000, 2),
+    }, event="done")
+
+async def _relay_backend_stream(started: dict, req: PredictRequest, tenant: str, cache_key: str, provider: str, start_time: float, lease: _StreamLease, semantic_namespace: str | None = None, semantic_vector=None):
+    stream = started["stream"]
+    backend_name = started["backend_name"]
+    chunks = lease.chunks
+
+    try:
+        if started["first_chunk"]:
+            yield _sse_event({"delta": started["first_chunk"]})
+
+        async for item in stream:
+            chunk = lease.record(item)
+            if chunk:
+                yield _sse_event({"delta": chunk})
+
+    except Exception as e:
+        REQUEST_COUNT.labels(tenant_id=tenant, status="error").inc()
+        PROVIDER_FAILURES.labels(provider=provider).inc()
+        ERROR_COUNT.labels(
+            tenant_id=tenant,
+            error_type="stream"
+        ).inc()
+
+        logger.exception(
+            "inference_stream_error",
+            tenant_id=tenant,
+            model=req.model,
+            backend=backend_name,
+        )
+        yield _sse_event({"error": str(e)}, event="error")
+        return
+
+    finally:
+        await lease.close_stream()
+
+    output = "".join(chunks)
+    if not req.cache_bypass:
+        await cache_set(cache_key, encode_cache_value(output, backend_name))
+        if semantic_vector is not None:
+            semantic_cache.add(semantic_namespace, semantic_vector, cache_key)
+
+    _record_success_metrics(tenant, start_time)
+    logger.info(
+        "inference_success",
+        tenant_id=tenant,
+        model=req.model,
+        backend=backend_name,
+    )
+    yield _sse_event({
+        "backend": backend_name,
+        "retries": started["retries"],
+        "fallback_used": started["fallback_used"],
+        "cache_hit": False,
+        "latency_ms": round((time.time() - start_time)*1000, 2),
+    }, event="done")
+
+@app.post("/v1/predict/batch", response_model=BatchPredictResponse)
+async def predict_batch(
+    body: BatchPredictRequest,
+    response: Response,
+    auth: AuthContext = Depends(require_api_key),
+    x_request_timeout_ms: Annotated[int | None, Header()] = None,
+):
+    """Run many predictions in one call.
+
+    Auth, the rate limiter (charged once per item) and the token quota are
+    checked once for the whole batch, and all cache keys are read with one
+    MGET. Misses run through _execute_with_resilience at most
+    BATCH_MAX_CONCURRENCY at a time, identical items only once, and their
+    results are written back in one pipeline. Failures are reported per
+    item; semantic_cache is not supported here.
+    """
+    tenant = str(auth.tenant_id)
+    start_time = time.time()
+    deadline.start_deadline(body.timeout_ms or x_request_timeout_ms)
+    items = body.items
+    slot = None
 
     try:
-        result = await _execute_with_resilience(
+        rate_limit = await check_rate_limit(tenant, str(auth.api_key_id), cost=len(items))
+        response.headers.update(rate_limit.headers())
+        with stage("concurrency_slot"):
+            slot = await acquire_concurrency_slot(tenant, str(auth.api_key_id))
+
+        cache_keys = [_build_request_cache_key(item, tenant) for item in items]
+        results: list[BatchItemResult | None] = [None] * len(items)
+
+        lookup = [i for i, item in enumerate(items) if not item.cache_bypass]
+        cached_values = await cache_get_many([cache_keys[i] for i in lookup]) if lookup else []
+        for i, value in zip(lookup, cached_values):
+            if value is not None:
+                data = decode_cache_value(value)
+                results[i] = BatchItemResult(index=i, output=data["output"], backend=data["backend_name"], cache_hit=True)
+        cache_hits = sum(1 for result in results if result is not None)
+        CACHE_HITS.labels(tenant_id=tenant).inc(cache_hits)
+        CACHE_MISSES.labels(tenant_id=tenant).inc(len(lookup) - cache_hits)
+
+        # Identical items are computed once; bypass items always on their own
+        pending: dict[str, list[int]] = {}
+        for i, item in enumerate(items):
+            if results[i] is None:
+                pending.setdefault(f"bypass:{i}" if item.cache_bypass else cache_keys[i], []).append(i)
+
+        reservation = None
+        if pending:
+            reservation = await reserve_tokens(tenant, sum(
+                estimate_tokens(items[indices[0]].prompt) + items[indices[0]].max_tokens
+                for indices in pending.values()
+            ))
+            if reservation is not None:
+                response.headers.update(reservation.result.headers())
+
+        semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+
+        async def run_item(indices: list[int]):
+            item = items[indices[0]]
+            async with semaphore:
+                try:
+                    backend, _, provider, fallbacks = router.get_backend_for_model(item.model)
+                except HTTPException as e:
+                    return indices, None, e.status_code, str(e.detail)
+                except Exception as e:
+                    # e.g. a provider that isn't configured on this deployment
+                    return indices, None, 500, str(e)
+                try:
+                    result = await _execute_with_resilience(
+                        backend=backend,
+                        fallbacks=fallbacks,
+                        req=item,
+                        tenant=tenant
+                    )
+                except HTTPException as e:
+                    # Load shed by the provider's bulkhead
+                    return indices, None, e.status_code, str(e.detail)
+                except Exception as e:
+                    PROVIDER_FAILURES.labels(provider=provider).inc()
+                    return indices, None, 502, str(e) or e.__class__.__name__
+            return indices, result, 200, None
+
+        try:
+            outcomes = await asyncio.gather(*(run_item(indices) for indices in pending.values()))
+        except BaseException:
+            await settle_tokens(reservation, 0)
+            raise
+
+        to_cache = {}
+        usage_by_model: dict[str, list] = {}
+        for indices, result, status_code, error in outcomes:
+            if result is None:
+                for i in indices:
+                    results[i] = BatchItemResult(index=i, status_code=status_code, error=error)
+                continue
+
+            first = items[indices[0]]
+            usage = result["usage"]
+            totals = usage_by_model.setdefault(first.model, [Usage(estimated=usage.estimated), 0])
+            totals[0].prompt_tokens += usage.prompt_tokens
+            totals[0].completion_tokens += usage.completion_tokens
+            totals[1] += 1
+            if not first.cache_bypass:
+                to_cache[cache_keys[indices[0]]] = encode_cache_value(result["output"], result["backend_name"])
+
+            for n, i in enumerate(indices):
+                results[i] = BatchItemResult(
+                    index=i,
+                    output=result["output"],
+                    backend=result["backend_name"],
+                    retries=result["retries"],
+                    fallback_used=result["fallback_used"],
+                    # Duplicates were served by the first item's call
+                    cache_hit=n > 0,
+                )
+
+        await asyncio.gather(
+            cache_set_many(to_cache),
+            settle_tokens(reservation, sum(usage.total_tokens for usage, _ in usage_by_model.values())),
+            *(record_usage(tenant, model, usage, requests) for model, (usage, requests) in usage_by_model.items()),
+        )
+
+        errors = sum(1 for result in results if result.error is not None)
+        BATCH_PREDICT_ITEMS.labels(tenant_id=tenant, result="cache_hit").inc(cache_hits)
+        BATCH_PREDICT_ITEMS.labels(tenant_id=tenant, result="computed").inc(len(items) - cache_hits - errors)
+        BATCH_PREDICT_ITEMS.labels(tenant_id=tenant, result="error").inc(errors)
+        _record_success_metrics(tenant, start_time)
+
+        logger.info(
+            "batch_inference_success",
+            tenant_id=tenant,
+            items=len(items),
+            cache_hits=cache_hits,
+            errors=errors,
+        )
+
+        latency_ms = round((time.time() - start_time)*1000, 2)
+        return BatchPredictResponse(results=results, latency_ms=latency_ms)
+
+    except HTTPException as e:
+        if e.status_code == 429:
+            RATE_LIMIT_HITS.labels(tenant_id=tenant).inc()
+
+        REQUEST_COUNT.labels(tenant_id=tenant, status="error").inc()
+        ERROR_COUNT.labels(
+            tenant_id=tenant,
+            error_type=str(e.status_code)
+        ).inc()
+
+        logger.error(
+            "batch_inference_error",
+            tenant_id=tenant,
+            items=len(items),
+            error=str(e),
+        )
+        raise
+
+    finally:
+        await release_concurrency_slot(slot)
+
+async def _run_with_lock(
+    cache_key: str,
+    backend,
+    fallbacks,
+    req: PredictRequest,
+    tenant: str,
+    backend_name: str,
+):
+    async def compute():
+        return await _execute_with_resilience(
                 backend=backend,
-                fallback_backend=fallback_backend,
+                fallbacks=fallbacks,
                 req=req,
                 tenant=tenant
             )
-        output = result["output"]
-        backend_name = result["backend_name"]
-        # retries = result["retries"]
-        # fallback_used = result["fallback_used"]
-        # output = await backend.predict(
-        #     prompt=req.prompt,
-        #     model=req.model,
-        #     temperature=req.temperature,
-        #     max_tokens=req.max_tokens,
-        # )
-
-        response_payload = json.dumps({"output": output, "backend_name": backend_name})
-        await cache_set(cache_key, response_payload)
-
-        return {"output": result["output"], "retries": result["retries"], "fallback_used": result["fallback_used"], "cache_hit": cache_hit, "backend_name": backend_name}
 
-    finally:
-        await release_lock(lock_key)
+    # Coalesce concurrent misses for the same key, locally and across nodes
+    return await run_single_flight(cache_key, compute, tenant)
 
 def _record_success_metrics(tenant: str, start_time: float):
     REQUEST_COUNT.labels(
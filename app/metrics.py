@@ -1,4 +1,4 @@
-from prometheus_client import Counter, Histogram
+from prometheus_client import Counter, Gauge, Histogram
 
 REQUEST_COUNT = Counter(
     "inference_requests_total",
@@ -47,6 +47,18 @@ PROVIDER_REJECTIONS = Counter(
     ["provider"]
 )
 
+CIRCUIT_STATE = Gauge(
+    "provider_circuit_state",
+    "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+    ["provider"]
+)
+
+CIRCUIT_TRANSITIONS = Counter(
+    "provider_circuit_transitions_total",
+    "Circuit breaker state changes, by the state entered",
+    ["provider", "state"]
+)
+
 RETRY_COUNT = Counter(
     "retry_attempts_total",
     "Number of retry attempts",
@@ -63,4 +75,227 @@ FALLBACK_ATTEMPTS = Counter(
     "fallback_attempts_total",
     "Number of fallback attempts",
     ["tenant_id"]
-)
\ No newline at end of file
+)
+
+AUTH_CACHE_LOOKUPS = Counter(
+    "auth_cache_lookups_total",
+    "API key auth cache lookups",
+    ["result"]
+)
+
+AUTH_CACHE_INVALIDATIONS = Counter(
+    "auth_cache_invalidations_total",
+    "API key auth cache entries invalidated via pub/sub"
+)
+
+LAST_USED_BUFFER_SIZE = Gauge(
+    "last_used_buffer_size",
+    "API keys with a pending last_used_at update"
+)
+
+LAST_USED_FLUSH_LATENCY = Histogram(
+    "last_used_flush_latency_seconds",
+    "Latency of bulk last_used_at flushes in seconds"
+)
+
+LAST_USED_FLUSH_FAILURES = Counter(
+    "last_used_flush_failures_total",
+    "Failed bulk last_used_at flushes"
+)
+
+COALESCED_REQUESTS = Counter(
+    "inference_coalesced_requests_total",
+    "Cache misses served by another request's inference",
+    ["tenant_id", "scope"]
+)
+
+COALESCED_WAIT_LATENCY = Histogram(
+    "inference_coalesced_wait_seconds",
+    "Time followers spent waiting for the leader's result",
+    ["scope"]
+)
+
+LOCK_EXTENSIONS = Counter(
+    "inference_lock_extensions_total",
+    "Cache lock TTL extensions by long-running leaders"
+)
+
+CACHE_TIER_LOOKUPS = Counter(
+    "inference_cache_tier_lookups_total",
+    "Response cache lookups per tier",
+    ["tier", "result"]
+)
+
+L1_CACHE_BYTES = Gauge(
+    "inference_l1_cache_bytes",
+    "Bytes held by the in-process L1 response cache"
+)
+
+CACHE_STORED_BYTES = Histogram(
+    "inference_cache_value_bytes",
+    "Encoded size of values written to the response cache",
+    buckets=(64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+)
+
+CACHE_COMPRESSION_RATIO = Histogram(
+    "inference_cache_compression_ratio",
+    "Raw output bytes / stored output bytes for cache writes",
+    buckets=(1.0, 1.25, 1.5, 2.0, 3.0, 4.0, 6.0, 10.0)
+)
+
+SEMANTIC_CACHE_LOOKUPS = Counter(
+    "inference_semantic_cache_lookups_total",
+    "Semantic cache lookups",
+    ["result"]
+)
+
+SEMANTIC_CACHE_LATENCY = Histogram(
+    "inference_semantic_cache_lookup_seconds",
+    "Latency of semantic cache vector search in seconds",
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05)
+)
+
+RATE_LIMIT_DECISIONS = Counter(
+    "rate_limit_decisions_total",
+    "Rate limiter decisions by mode and where they were made",
+    ["mode", "source", "result"]
+)
+
+TOKEN_RATE_LIMIT_HITS = Counter(
+    "inference_token_rate_limit_hits_total",
+    "Requests rejected by the tokens-per-minute quota",
+    ["tenant_id"]
+)
+
+TOKENS_USED = Counter(
+    "inference_tokens_total",
+    "Provider tokens consumed",
+    ["tenant_id", "kind"]
+)
+
+USAGE_FLUSH_LATENCY = Histogram(
+    "usage_flush_latency_seconds",
+    "Latency of usage counter flushes to Postgres in seconds"
+)
+
+USAGE_FLUSH_FAILURES = Counter(
+    "usage_flush_failures_total",
+    "Failed usage counter flushes"
+)
+
+BATCH_SIZE = Histogram(
+    "inference_batch_size",
+    "Number of requests dispatched together in one batch",
+    ["backend"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+
+BATCH_QUEUE_DELAY = Histogram(
+    "inference_batch_queue_delay_seconds",
+    "Time a request waited in the batcher before its batch was dispatched",
+    ["backend"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5)
+)
+
+BATCH_PREDICT_ITEMS = Counter(
+    "inference_batch_predict_items_total",
+    "Items in /v1/predict/batch calls, by outcome",
+    ["tenant_id", "result"]
+)
+
+HEDGE_REQUESTS = Counter(
+    "inference_hedge_requests_total",
+    "Calls slow enough to hedge, by whether the hedge was sent, the budget ran out or its target had no free capacity",
+    ["backend", "outcome"]
+)
+
+HEDGE_WINS = Counter(
+    "inference_hedge_wins_total",
+    "Hedged calls by which request returned the result first",
+    ["backend", "winner"]
+)
+
+ENDPOINT_SELECTIONS = Counter(
+    "backend_endpoint_selections_total",
+    "Calls routed to each endpoint of a provider pool, by strategy (or probe)",
+    ["provider", "endpoint", "strategy"]
+)
+
+ENDPOINT_OUTSTANDING = Gauge(
+    "backend_endpoint_outstanding_requests",
+    "Calls in flight per endpoint",
+    ["provider", "endpoint"]
+)
+
+ENDPOINT_LATENCY = Gauge(
+    "backend_endpoint_latency_ewma_seconds",
+    "Latency EWMA per endpoint, as used by the ewma strategy",
+    ["provider", "endpoint"]
+)
+
+ROUTING_RELOADS = Counter(
+    "routing_config_reloads_total",
+    "Routing config reloads after the file changed",
+    ["result"]
+)
+
+BULKHEAD_IN_FLIGHT = Gauge(
+    "provider_bulkhead_in_flight",
+    "Backend calls in flight per provider",
+    ["provider"]
+)
+
+BULKHEAD_QUEUED = Gauge(
+    "provider_bulkhead_queued",
+    "Backend calls waiting for a provider slot",
+    ["provider"]
+)
+
+BULKHEAD_REJECTIONS = Counter(
+    "provider_bulkhead_rejections_total",
+    "Calls shed because a provider's wait queue was full or the wait timed out",
+    ["provider", "reason"]
+)
+
+SCHEDULER_QUEUE_DEPTH = Gauge(
+    "scheduler_queue_depth",
+    "Calls a tenant has waiting for a provider slot",
+    ["provider", "tenant_id"]
+)
+
+SCHEDULER_WAIT_SECONDS = Histogram(
+    "scheduler_wait_seconds",
+    "Time a tenant's calls waited for a provider slot",
+    ["provider", "tenant_id"],
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5]
+)
+
+HTTP_POOL_IN_FLIGHT = Gauge(
+    "provider_http_requests_in_flight",
+    "Upstream HTTP requests in flight per provider, including any waiting for a pooled connection",
+    ["provider"]
+)
+
+HTTP_POOL_UTILIZATION = Gauge(
+    "provider_http_pool_utilization",
+    "Upstream requests in flight as a fraction of the provider's max connections; above 1 they queue (or share HTTP/2 connections)",
+    ["provider"]
+)
+
+HTTP_POOL_WARMUP = Counter(
+    "provider_http_pool_warmup_total",
+    "Connections pre-warmed at startup",
+    ["provider", "result"]
+)
+
+DEADLINE_EXCEEDED = Counter(
+    "inference_deadline_exceeded_total",
+    "Requests that ran out of deadline, by the stage they were in",
+    ["stage"]
+)
+
+RETRY_BUDGET_EXHAUSTED = Counter(
+    "provider_retry_budget_exhausted_total",
+    "Retries skipped because the provider's retry budget was empty",
+    ["provider"]
+)
@@ -1,4 +1,6 @@
 from app.models.base import Base
 from app.models.api_key import ApiKey
+from app.models.rate_limit_policy import RateLimitPolicy
+from app.models.usage_record import UsageRecord
 
-__all__ = ["Base", "ApiKey"]
+__all__ = ["Base", "ApiKey", "RateLimitPolicy", "UsageRecord"]
@@ -0,0 +1,46 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import DateTime, String, Integer, Float, func, text, ForeignKey, CheckConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class RateLimitPolicy(Base):
+    """Rate limits for one tenant or one API key (exactly one is set).
+
+    A key's policy takes precedence over its tenant's; anything unset falls
+    back to the gateway defaults.
+    """
+    __tablename__ = "rate_limit_policies"
+    __table_args__ = (
+        CheckConstraint(
+            "(tenant_id IS NULL) <> (api_key_id IS NULL)",
+            name="ck_rate_limit_policies_one_subject",
+        ),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid.uuid4,
+        server_default=text("gen_random_uuid()"),
+    )
+    tenant_id: Mapped[Optional[uuid.UUID]] = mapped_column(UUID(as_uuid=True), ForeignKey("tenants.id", ondelete="CASCADE"), nullable=True, unique=True)
+    api_key_id: Mapped[Optional[uuid.UUID]] = mapped_column(UUID(as_uuid=True), ForeignKey("api_keys.id", ondelete="CASCADE"), nullable=True, unique=True)
+    requests_per_min: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Token bucket capacity; setting it switches the policy to token bucket
+    burst: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    max_concurrency: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    # Shared by all of a tenant's keys; only read from tenant policies
+    tokens_per_min: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    # Share of provider capacity under contention, relative to other
+    # tenants (see app/backends/scheduler.py); only read from tenant policies
+    scheduling_weight: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    # "strict" or "local", see app.rate_limit
+    mode: Mapped[Optional[str]] = mapped_column(String(16), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -0,0 +1,101 @@
+import asyncio
+import time
+
+import structlog
+
+from app.config import POLICY_REFRESH_SECONDS, POLICY_CHANGED_CHANNEL, SCHEDULER_DEFAULT_WEIGHT
+from app.db import async_session_maker
+from app.redis import redis_client
+from app.repositories import list_rate_limit_policies
+
+logger = structlog.get_logger()
+
+
+class Policy:
+    def __init__(self, requests_per_min: int, burst: int | None = None, max_concurrency: int | None = None, mode: str | None = None, tokens_per_min: int | None = None, scheduling_weight: float | None = None):
+        self.requests_per_min = requests_per_min
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.mode = mode
+        self.tokens_per_min = tokens_per_min
+        self.scheduling_weight = scheduling_weight
+
+
+class PolicyCache:
+    """All rate limit policies, held in memory so lookups never hit the DB.
+
+    The table is small, so it is reloaded wholesale and swapped in
+    atomically by `run_policy_refresher`.
+    """
+
+    def __init__(self):
+        self._by_tenant: dict[str, Policy] = {}
+        self._by_key: dict[str, Policy] = {}
+        self.loaded = False
+
+    def resolve(self, tenant_id, api_key_id) -> Policy | None:
+        """The key's policy if it has one, else its tenant's, else None."""
+        return self._by_key.get(str(api_key_id)) or self._by_tenant.get(str(tenant_id))
+
+    def resolve_tenant(self, tenant_id) -> Policy | None:
+        return self._by_tenant.get(str(tenant_id))
+
+    def scheduling_weight(self, tenant_id) -> float:
+        policy = self._by_tenant.get(str(tenant_id))
+        if policy is None or not policy.scheduling_weight:
+            return SCHEDULER_DEFAULT_WEIGHT
+        return policy.scheduling_weight
+
+    def replace(self, rows):
+        by_tenant, by_key = {}, {}
+        for row in rows:
+            policy = Policy(row.requests_per_min, row.burst, row.max_concurrency, row.mode, row.tokens_per_min, row.scheduling_weight)
+            if row.api_key_id is not None:
+                by_key[str(row.api_key_id)] = policy
+            else:
+                by_tenant[str(row.tenant_id)] = policy
+        self._by_tenant, self._by_key = by_tenant, by_key
+        self.loaded = True
+
+    async def reload(self):
+        async with async_session_maker() as db:
+            rows = await list_rate_limit_policies(db)
+        self.replace(rows)
+
+
+policy_cache = PolicyCache()
+
+
+async def publish_policy_change():
+    """Ask every gateway node to reload its policies now."""
+    await redis_client.publish(POLICY_CHANGED_CHANNEL, "1")
+
+
+async def run_policy_refresher(interval: float = POLICY_REFRESH_SECONDS):
+    """Background task: reload on change notifications, and every `interval` regardless."""
+    pubsub = None
+    while True:
+        try:
+            if pubsub is None:
+                pubsub = redis_client.pubsub()
+                await pubsub.subscribe(POLICY_CHANGED_CHANNEL)
+            await policy_cache.reload()
+
+            deadline = time.monotonic() + interval
+            while (remaining := deadline - time.monotonic()) > 0:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+                if message is not None:
+                    break
+        except asyncio.CancelledError:
+            if pubsub is not None:
+                await pubsub.reset()
+            raise
+        except Exception as e:
+            logger.warning("policy_refresh_failed", error=str(e))
+            if pubsub is not None:
+                try:
+                    await pubsub.reset()
+                except Exception:
+                    pass
+                pubsub = None
+            await asyncio.sleep(1)
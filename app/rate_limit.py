@@ -1,25 +1,493 @@
+import asyncio
+import math
 import time
+import uuid
+from collections import OrderedDict
 from fastapi import HTTPException, status
-from app.redis import redis_client
+from app.config import (
+    RATE_LIMIT_ALGORITHM,
+    RATE_LIMIT_WINDOW_SECONDS,
+    RATE_LIMIT_MODE,
+    RATE_LIMIT_LOCAL_TENANTS,
+    RATE_LIMIT_LEASE_FRACTION,
+    RATE_LIMIT_LEASE_TTL_SECONDS,
+    CONCURRENCY_SLOT_TTL_SECONDS,
+    DEFAULT_TOKENS_PER_MIN,
+)
+from app.metrics import RATE_LIMIT_DECISIONS, TOKEN_RATE_LIMIT_HITS
+from app.policies import policy_cache
+from app.redis import IS_CLUSTER, redis_client, redis_bytes_client
+from app.cache import l1_get, remember_redis_value, cache_get
 
 DEFAULT_REQUESTS_PER_MIN = 10
 
-async def check_rate_limit(tenant_id: str, api_key_id: str):
+# Both scripts keep all state in a single hash and read the clock from
+# Redis, so one EVALSHA is atomic across workers and nodes.
+# They return {allowed, remaining, retry_after_ms, reset_ms, granted}.
+# With ARGV[4] == 1 ("partial") they grant as much of `cost` as is left,
+# which is how local mode leases quota in chunks.
+
+# Sliding window counter: the previous fixed window is weighted by how much
+# of it still overlaps the sliding window, which removes the 2x burst at
+# fixed window boundaries.
+_SLIDING_WINDOW_LUA = """
+local key = KEYS[1]
+local window = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local partial = tonumber(ARGV[4]) == 1
+
+local t = redis.call("TIME")
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local cur_start = now - (now % window)
+
+local data = redis.call("HMGET", key, "start", "cur", "prev")
+local start = tonumber(data[1]) or cur_start
+local cur = tonumber(data[2]) or 0
+local prev = tonumber(data[3]) or 0
+if start ~= cur_start then
+    if start == cur_start - window then prev = cur else prev = 0 end
+    cur = 0
+end
+
+local elapsed = now - cur_start
+local used = prev * (window - elapsed) / window + cur
+local allowed = 0
+local retry_after = 0
+
+if partial then
+    cost = math.max(1, math.min(cost, math.floor(limit - used)))
+end
+
+if used + cost <= limit then
+    allowed = 1
+    cur = cur + cost
+    used = used + cost
+elseif cur + cost <= limit then
+    -- wait for enough of the previous window to slide out
+    local weight = (limit - cur - cost) / prev
+    retry_after = math.ceil(window * (1 - weight) - elapsed)
+elseif cost <= limit then
+    -- current window alone is over: wait for it to become the previous one
+    local weight = (limit - cost) / cur
+    retry_after = math.ceil(window - elapsed + window * (1 - weight))
+else
+    retry_after = -1
+end
+
+redis.call("HSET", key, "start", cur_start, "cur", cur, "prev", prev)
+redis.call("PEXPIRE", key, window * 2)
+
+return {allowed, math.max(0, math.floor(limit - used)), retry_after, window - elapsed, allowed * cost}
+"""
+
+# Token bucket: `capacity` tokens, refilled continuously at `rate` per ms.
+_TOKEN_BUCKET_LUA = """
+local key = KEYS[1]
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local partial = tonumber(ARGV[4]) == 1
+
+local t = redis.call("TIME")
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+local data = redis.call("HMGET", key, "tokens", "ts")
+local tokens = tonumber(data[1]) or capacity
+local ts = tonumber(data[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+if partial then
+    cost = math.max(1, math.min(cost, math.floor(tokens)))
+end
+
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    allowed = 1
+    tokens = tokens - cost
+elseif cost <= capacity then
+    retry_after = math.ceil((cost - tokens) / rate)
+else
+    retry_after = -1
+end
+
+redis.call("HSET", key, "tokens", tokens, "ts", now)
+redis.call("PEXPIRE", key, math.ceil(capacity / rate) + 1000)
+
+return {allowed, math.floor(tokens), retry_after, math.ceil((capacity - tokens) / rate), allowed * cost}
+"""
+
+
+def _with_cache_read(limiter: str) -> str:
+    """A limiter script that also returns the cache entry at KEYS[2], when
+    admitted, as {..., value, pttl}: rate limit and cache lookup in one
+    round trip. Runs on the cache's bytes client, since values are binary.
+    """
+    return f"""
+local function charge()
+{limiter}
+end
+local result = charge()
+if result[1] == 1 then
+    local value = redis.call("GET", KEYS[2])
+    if value then
+        result[6] = value
+        result[7] = redis.call("PTTL", KEYS[2])
+    end
+end
+return result
+"""
+
+
+_SLIDING_WINDOW = redis_client.register_script(_SLIDING_WINDOW_LUA)
+_TOKEN_BUCKET = redis_client.register_script(_TOKEN_BUCKET_LUA)
+_SLIDING_WINDOW_AND_GET = redis_bytes_client.register_script(_with_cache_read(_SLIDING_WINDOW_LUA))
+_TOKEN_BUCKET_AND_GET = redis_bytes_client.register_script(_with_cache_read(_TOKEN_BUCKET_LUA))
+
+
+# In-flight requests as a sorted set of request ids scored by lease expiry,
+# so slots held by crashed workers free themselves.
+_ACQUIRE_SLOT = redis_client.register_script("""
+local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local member = ARGV[2]
+local ttl = tonumber(ARGV[3])
+
+local t = redis.call("TIME")
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+redis.call("ZREMRANGEBYSCORE", key, "-inf", now)
+if redis.call("ZCARD", key) >= limit then
+    return 0
+end
+redis.call("ZADD", key, now + ttl, member)
+redis.call("PEXPIRE", key, ttl)
+return 1
+""")
+
+
+# Give back part of a sliding window charge (unused token reservations)
+_REFUND = redis_client.register_script("""
+local key = KEYS[1]
+local window = tonumber(ARGV[1])
+local amount = tonumber(ARGV[2])
+
+local t = redis.call("TIME")
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local cur_start = now - (now % window)
+
+if tonumber(redis.call("HGET", key, "start")) ~= cur_start then
+    return 0
+end
+local cur = tonumber(redis.call("HGET", key, "cur")) or 0
+redis.call("HSET", key, "cur", math.max(0, cur - amount))
+return 1
+""")
+
+
+class RateLimitResult:
+    def __init__(self, allowed: bool, limit: int, remaining: int, retry_after_ms: int, reset_ms: int, unit: str = ""):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.retry_after_ms = retry_after_ms
+        self.reset_ms = reset_ms
+        # Header suffix, e.g. "-Tokens" for X-RateLimit-Limit-Tokens
+        self.unit = unit
+
+    def headers(self) -> dict:
+        headers = {
+            f"X-RateLimit-Limit{self.unit}": str(self.limit),
+            f"X-RateLimit-Remaining{self.unit}": str(self.remaining),
+            f"X-RateLimit-Reset{self.unit}": str(math.ceil(self.reset_ms / 1000)),
+        }
+        if not self.allowed and self.retry_after_ms >= 0:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after_ms / 1000)))
+        return headers
+
+
+def _too_many_requests(result: RateLimitResult) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Rate limit exceeded",
+        headers=result.headers(),
+    )
+
+
+def _limiter_args(limit: int, cost: int, algorithm: str, partial: bool, burst: int | None) -> list:
+    window_ms = RATE_LIMIT_WINDOW_SECONDS * 1000
+    if algorithm == "token_bucket":
+        return [burst or limit, limit / window_ms, cost, int(partial)]
+    if algorithm == "sliding_window":
+        return [window_ms, limit, cost, int(partial)]
+    raise ValueError(f"Unknown rate limit algorithm: {algorithm}")
+
+
+def _parse(raw, limit: int):
+    allowed, remaining, retry_after_ms, reset_ms, granted = (int(v) for v in raw[:5])
+    return RateLimitResult(bool(allowed), limit, remaining, retry_after_ms, reset_ms), granted
+
+
+async def _charge(key: str, limit: int, cost: int, algorithm: str, partial: bool = False, burst: int | None = None):
+    """Run the limiter script; returns (RateLimitResult, granted)."""
+    args = _limiter_args(limit, cost, algorithm, partial, burst)
+    script = _TOKEN_BUCKET if algorithm == "token_bucket" else _SLIDING_WINDOW
+    return _parse(await script(keys=[key], args=args), limit)
+
+
+class _Lease:
+    __slots__ = ("tokens", "expires_at", "remaining", "reset_at", "denied_until", "retry_after_ms", "lock")
+
+    def __init__(self):
+        self.tokens = 0
+        self.expires_at = 0.0
+        self.remaining = 0
+        self.reset_at = 0.0
+        self.denied_until = 0.0
+        self.retry_after_ms = 0
+        self.lock = asyncio.Lock()
+
+
+class LocalQuota:
+    """Approximate distributed limiter: each worker leases quota in chunks.
+
+    Requests are admitted from the local lease without touching Redis; only
+    an empty lease costs a round trip. Leases are charged in Redis up front,
+    so the fleet can never admit more than the limit — unused leased tokens
+    (at most chunk x workers per window) show up as slight under-admission.
+    Near the limit the chunk shrinks to one request, i.e. strict mode.
+    Denials are remembered until Retry-After so abusive clients are
+    rejected locally too.
+    """
+
+    def __init__(
+            self,
+            lease_fraction: float = RATE_LIMIT_LEASE_FRACTION,
+            lease_ttl_seconds: float = RATE_LIMIT_LEASE_TTL_SECONDS,
+            max_keys: int = 100_000,
+    ):
+        self.lease_fraction = lease_fraction
+        self.lease_ttl_seconds = lease_ttl_seconds
+        self.max_keys = max_keys
+        self._leases: OrderedDict[str, _Lease] = OrderedDict()
+
+    async def acquire(self, key: str, limit: int, cost: int, algorithm: str, burst: int | None = None) -> RateLimitResult:
+        lease = self._lease_for(key)
+
+        result = self._take_local(lease, limit, cost)
+        if result is not None:
+            return result
+
+        async with lease.lock:
+            # Another coroutine may have refilled the lease while we waited
+            result = self._take_local(lease, limit, cost)
+            if result is not None:
+                return result
+
+            chunk = max(cost, int(limit * self.lease_fraction))
+            if lease.remaining and lease.remaining < chunk * 2:
+                # Close to the limit: stop leasing ahead
+                chunk = cost
+            result, granted = await _charge(key, limit, chunk, algorithm, partial=True, burst=burst)
+            RATE_LIMIT_DECISIONS.labels(mode="local", source="redis", result="allowed" if result.allowed else "limited").inc()
+
+            now = time.monotonic()
+            if not result.allowed:
+                lease.tokens = 0
+                lease.denied_until = now + max(0, result.retry_after_ms) / 1000
+                lease.retry_after_ms = result.retry_after_ms
+                lease.reset_at = now + result.reset_ms / 1000
+                raise _too_many_requests(result)
+
+            lease.tokens = granted - cost
+            lease.expires_at = now + self.lease_ttl_seconds
+            lease.remaining = result.remaining
+            lease.reset_at = now + result.reset_ms / 1000
+            result.remaining += lease.tokens
+            return result
+
+    def _take_local(self, lease: _Lease, limit: int, cost: int) -> RateLimitResult | None:
+        now = time.monotonic()
+        if now < lease.denied_until:
+            RATE_LIMIT_DECISIONS.labels(mode="local", source="local", result="limited").inc()
+            result = RateLimitResult(
+                False, limit, 0,
+                int((lease.denied_until - now) * 1000),
+                int(max(0.0, lease.reset_at - now) * 1000),
+            )
+            raise _too_many_requests(result)
+
+        if lease.tokens < cost or now >= lease.expires_at:
+            return None
+
+        lease.tokens -= cost
+        RATE_LIMIT_DECISIONS.labels(mode="local", source="local", result="allowed").inc()
+        return RateLimitResult(
+            True, limit, lease.remaining + lease.tokens, 0,
+            int(max(0.0, lease.reset_at - now) * 1000),
+        )
+
+    def _lease_for(self, key: str) -> _Lease:
+        lease = self._leases.get(key)
+        if lease is None:
+            lease = _Lease()
+            self._leases[key] = lease
+            while len(self._leases) > self.max_keys:
+                self._leases.popitem(last=False)
+        else:
+            self._leases.move_to_end(key)
+        return lease
+
+
+local_quota = LocalQuota()
+
+
+def rate_limit_mode(tenant_id: str) -> str:
+    if tenant_id in RATE_LIMIT_LOCAL_TENANTS:
+        return "local"
+    return RATE_LIMIT_MODE
+
+
+async def check_rate_limit(
+        tenant_id: str,
+        api_key_id: str,
+        limit: int | None = None,
+        cost: int = 1,
+        algorithm: str | None = None,
+        mode: str | None = None,
+) -> RateLimitResult:
     """Check if the tenant has exceeded the rate limit for the given API key.
+
+    Limits come from the in-memory policy cache (key policy, then tenant
+    policy, then DEFAULT_REQUESTS_PER_MIN); explicit arguments override it.
+    In "strict" mode every call charges `cost` requests in one atomic Redis
+    round trip; in "local" mode most calls are admitted from a leased local
+    quota (see LocalQuota). Raises a 429 with Retry-After and X-RateLimit-*
+    headers when over the limit.
     """
+    key, limit, algorithm, burst, mode = _resolve_limit(tenant_id, api_key_id, limit, algorithm, mode)
+
+    if mode == "local":
+        return await local_quota.acquire(key, limit, cost, algorithm, burst=burst)
+
+    result, _ = await _charge(key, limit, cost, algorithm, burst=burst)
+    return _strict_decision(result)
+
+
+def _resolve_limit(tenant_id: str, api_key_id: str, limit: int | None, algorithm: str | None, mode: str | None):
+    """(key, limit, algorithm, burst, mode) for a request, from its policy."""
+    policy = policy_cache.resolve(tenant_id, api_key_id)
+    burst = policy.burst if policy else None
+    if limit is None:
+        limit = policy.requests_per_min if policy else DEFAULT_REQUESTS_PER_MIN
+    if algorithm is None:
+        # burst only means something for a token bucket
+        algorithm = "token_bucket" if burst else RATE_LIMIT_ALGORITHM
+    mode = mode or (policy.mode if policy and policy.mode else rate_limit_mode(tenant_id))
+    return f"rl:{algorithm}:{tenant_id}:{api_key_id}", limit, algorithm, burst, mode
+
 
-    now = int(time.time())
-    window = now // 60
-    key = f"rl:{tenant_id}:{api_key_id}:{window}"
+def _strict_decision(result: RateLimitResult) -> RateLimitResult:
+    RATE_LIMIT_DECISIONS.labels(mode="strict", source="redis", result="allowed" if result.allowed else "limited").inc()
+    if not result.allowed:
+        raise _too_many_requests(result)
+    return result
 
-    count = await redis_client.incr(key)
 
-    if count == 1:
-        await redis_client.expire(key, 60)
-    
-    if count > DEFAULT_REQUESTS_PER_MIN:
+async def check_rate_limit_and_cache(tenant_id: str, api_key_id: str, cache_key: str) -> tuple[RateLimitResult, bytes | None]:
+    """`check_rate_limit` and `cache_get(cache_key)` together.
+
+    In strict mode with an L1 miss, the limiter script reads the cache entry
+    too, so a cache hit costs exactly one Redis round trip. An L1 hit or a
+    local-mode admission needs at most one round trip anyway and takes the
+    ordinary path, as does Cluster. The cache is only read once the request
+    is admitted.
+    """
+    key, limit, algorithm, burst, mode = _resolve_limit(tenant_id, api_key_id, None, None, None)
+
+    cached = l1_get(cache_key)
+    # On Cluster the two keys live in different slots, so one script can't touch both
+    if cached is not None or mode == "local" or IS_CLUSTER:
+        result = await check_rate_limit(tenant_id, api_key_id, limit=limit, algorithm=algorithm, mode=mode)
+        return result, cached if cached is not None else await cache_get(cache_key)
+
+    script = _TOKEN_BUCKET_AND_GET if algorithm == "token_bucket" else _SLIDING_WINDOW_AND_GET
+    raw = await script(keys=[key, cache_key], args=_limiter_args(limit, 1, algorithm, False, burst))
+    result, _ = _parse(raw, limit)
+    _strict_decision(result)
+    value, pttl = (raw[5], int(raw[6])) if len(raw) > 5 else (None, 0)
+    return result, remember_redis_value(cache_key, value, pttl)
+
+
+async def acquire_concurrency_slot(tenant_id: str, api_key_id: str) -> str | None:
+    """Reserve an in-flight slot if the policy sets max_concurrency.
+
+    Returns a token to pass to `release_concurrency_slot`, or None when the
+    request is not concurrency-limited. Raises a 429 when all slots are taken.
+    """
+    policy = policy_cache.resolve(tenant_id, api_key_id)
+    if policy is None or not policy.max_concurrency:
+        return None
+
+    key = f"conc:{tenant_id}:{api_key_id}"
+    token = uuid.uuid4().hex
+    acquired = await _ACQUIRE_SLOT(keys=[key], args=[policy.max_concurrency, token, CONCURRENCY_SLOT_TTL_SECONDS * 1000])
+    if not acquired:
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Rate limit exceeded",
-            headers={"Retry-After": "60"}
-        )
\ No newline at end of file
+            detail="Too many concurrent requests",
+            headers={"Retry-After": "1"},
+        )
+    return f"{key}|{token}"
+
+
+async def release_concurrency_slot(slot: str | None):
+    if slot is None:
+        return
+    key, _, token = slot.partition("|")
+    await redis_client.zrem(key, token)
+
+
+class TokenReservation:
+    def __init__(self, key: str, limit: int, tokens: int, result: RateLimitResult):
+        self.key = key
+        self.limit = limit
+        self.tokens = tokens
+        self.result = result
+
+
+async def reserve_tokens(tenant_id: str, tokens: int) -> TokenReservation | None:
+    """Charge `tokens` up front against the tenant's tokens-per-minute quota.
+
+    Callers reserve the worst case (prompt estimate + max_tokens) and call
+    `settle_tokens` with the real usage afterwards. Returns None when the
+    tenant has no token quota; raises a 429 when the quota is exhausted.
+    """
+    policy = policy_cache.resolve_tenant(tenant_id)
+    limit = policy.tokens_per_min if policy and policy.tokens_per_min else DEFAULT_TOKENS_PER_MIN
+    if not limit:
+        return None
+
+    # A single request larger than the whole quota can still run on an idle minute
+    tokens = min(tokens, limit)
+    key = f"tpm:{tenant_id}"
+    result, _ = await _charge(key, limit, tokens, "sliding_window")
+    result.unit = "-Tokens"
+
+    if not result.allowed:
+        TOKEN_RATE_LIMIT_HITS.labels(tenant_id=tenant_id).inc()
+        raise _too_many_requests(result)
+    return TokenReservation(key, limit, tokens, result)
+
+
+async def settle_tokens(reservation: TokenReservation | None, used_tokens: int):
+    """Refund the unused part of a reservation, or charge any overrun."""
+    if reservation is None:
+        return
+
+    delta = reservation.tokens - used_tokens
+    if delta > 0:
+        await _REFUND(keys=[reservation.key], args=[RATE_LIMIT_WINDOW_SECONDS * 1000, delta])
+    elif delta < 0:
+        await _charge(reservation.key, reservation.limit, -delta, "sliding_window", partial=True)
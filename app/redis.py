@@ -1,6 +1,59 @@
-import os
 import redis.asyncio as redis
-from app.settings import settings
+from redis.asyncio.cluster import RedisCluster
+from redis.asyncio.connection import parse_url
+from redis.asyncio.sentinel import Sentinel
+
+from app.config import (
+    REDIS_URL,
+    REDIS_MODE,
+    REDIS_SENTINELS,
+    REDIS_SENTINEL_SERVICE,
+    REDIS_MAX_CONNECTIONS,
+    REDIS_POOL_TIMEOUT_SECONDS,
+    REDIS_SOCKET_TIMEOUT_SECONDS,
+    REDIS_CONNECT_TIMEOUT_SECONDS,
+    REDIS_HEALTH_CHECK_INTERVAL_SECONDS,
+)
+
+# Multi-key commands and scripts need their keys in one slot on Cluster;
+# callers hash-tag such keys ("cache:{digest}", "lock:cache:{digest}")
+IS_CLUSTER = REDIS_MODE == "cluster"
+
+
+def _sentinel_hosts() -> list[tuple[str, int]]:
+    hosts = []
+    for address in REDIS_SENTINELS.split(","):
+        host, _, port = address.strip().rpartition(":")
+        hosts.append((host, int(port)))
+    return hosts
+
+
+def create_client(decode_responses: bool):
+    """A client for the configured deployment, with a bounded connection pool."""
+    options = dict(
+        decode_responses=decode_responses,
+        socket_timeout=REDIS_SOCKET_TIMEOUT_SECONDS,
+        socket_connect_timeout=REDIS_CONNECT_TIMEOUT_SECONDS,
+        health_check_interval=REDIS_HEALTH_CHECK_INTERVAL_SECONDS,
+        max_connections=REDIS_MAX_CONNECTIONS,
+    )
+    if REDIS_MODE == "cluster":
+        # Pool size is per node
+        return RedisCluster.from_url(REDIS_URL, **options)
+    if REDIS_MODE == "sentinel":
+        # Credentials and db still come from REDIS_URL; the master's address from the sentinels
+        credentials = {k: v for k, v in parse_url(REDIS_URL).items() if k in ("username", "password", "db")}
+        sentinel = Sentinel(_sentinel_hosts(), socket_timeout=REDIS_CONNECT_TIMEOUT_SECONDS)
+        return sentinel.master_for(REDIS_SENTINEL_SERVICE, **credentials, **options)
+    if REDIS_MODE != "standalone":
+        raise ValueError(f"Unknown REDIS_MODE: {REDIS_MODE}")
+    # Waits up to REDIS_POOL_TIMEOUT_SECONDS for a free connection instead of failing at once
+    pool = redis.BlockingConnectionPool.from_url(REDIS_URL, timeout=REDIS_POOL_TIMEOUT_SECONDS, **options)
+    return redis.Redis(connection_pool=pool)
+
+
+# Text client for counters, pub/sub and scripts; the bytes client is for
+# binary values (the response cache)
+redis_client = create_client(decode_responses=True)
+redis_bytes_client = create_client(decode_responses=False)
 
-redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
-redis_client = redis.from_url(redis_url, decode_responses=True)
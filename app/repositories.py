@@ -1,7 +1,9 @@
-from sqlalchemy import select, update
+from sqlalchemy import select, update, values, column, or_, DateTime
+from sqlalchemy.dialects.postgresql import UUID, insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from datetime import datetime, timezone
 from app.models.api_key import ApiKey
+from app.models.rate_limit_policy import RateLimitPolicy
+from app.models.usage_record import UsageRecord
 
 async def get_active_api_key_by_hash(db: AsyncSession, key_hash: str) -> ApiKey | None:
     stmt = select(ApiKey).where(
@@ -11,10 +13,92 @@ async def get_active_api_key_by_hash(db: AsyncSession, key_hash: str) -> ApiKey
     result = await db.execute(stmt)
     return result.scalar_one_or_none()
 
-async def touch_api_key_used(db:AsyncSession, api_key_id):
+async def touch_api_keys_used(db: AsyncSession, last_used: dict) -> int:
+    """Bulk-apply {api_key_id: last_used_at} in a single UPDATE ... FROM (VALUES ...).
+
+    Rows are only moved forward in time, so concurrent flushes from several
+    nodes cannot overwrite a newer timestamp with an older one.
+    """
+    if not last_used:
+        return 0
+
+    batch = values(
+        column("id", UUID(as_uuid=True)),
+        column("last_used_at", DateTime(timezone=True)),
+        name="batch",
+    ).data(list(last_used.items()))
+
     stmt = update(ApiKey).where(
-        ApiKey.id == api_key_id
+        ApiKey.id == batch.c.id,
+        or_(
+            ApiKey.last_used_at.is_(None),
+            ApiKey.last_used_at < batch.c.last_used_at,
+        ),
+    ).values(
+        last_used_at = batch.c.last_used_at
+    ).execution_options(synchronize_session=False)
+    result = await db.execute(stmt)
+    return result.rowcount
+
+async def deactivate_api_key(db: AsyncSession, key_hash: str) -> bool:
+    stmt = update(ApiKey).where(
+        ApiKey.key_hash == key_hash,
+        ApiKey.is_active.is_(True),
     ).values(
-        last_used_at = datetime.now(timezone.utc)
+        is_active = False
+    )
+    result = await db.execute(stmt)
+    return result.rowcount > 0
+
+async def list_rate_limit_policies(db: AsyncSession) -> list[RateLimitPolicy]:
+    result = await db.execute(select(RateLimitPolicy))
+    return list(result.scalars().all())
+
+async def upsert_rate_limit_policy(
+    db: AsyncSession,
+    *,
+    tenant_id=None,
+    api_key_id=None,
+    requests_per_min: int,
+    burst: int | None = None,
+    max_concurrency: int | None = None,
+    mode: str | None = None,
+    tokens_per_min: int | None = None,
+    scheduling_weight: float | None = None,
+) -> RateLimitPolicy:
+    if (tenant_id is None) == (api_key_id is None):
+        raise ValueError("Exactly one of tenant_id or api_key_id must be given")
+
+    stmt = select(RateLimitPolicy).where(
+        RateLimitPolicy.tenant_id == tenant_id if tenant_id is not None
+        else RateLimitPolicy.api_key_id == api_key_id
+    )
+    policy = (await db.execute(stmt)).scalar_one_or_none()
+    if policy is None:
+        policy = RateLimitPolicy(tenant_id=tenant_id, api_key_id=api_key_id)
+        db.add(policy)
+
+    policy.requests_per_min = requests_per_min
+    policy.burst = burst
+    policy.max_concurrency = max_concurrency
+    policy.mode = mode
+    policy.tokens_per_min = tokens_per_min
+    policy.scheduling_weight = scheduling_weight
+    await db.flush()
+    return policy
+
+async def add_usage_records(db: AsyncSession, rows: list[dict]):
+    """Add usage deltas, creating or incrementing one row per (tenant, model, period)."""
+    if not rows:
+        return
+
+    stmt = insert(UsageRecord).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UsageRecord.tenant_id, UsageRecord.model, UsageRecord.period_start],
+        set_={
+            "requests": UsageRecord.requests + stmt.excluded.requests,
+            "prompt_tokens": UsageRecord.prompt_tokens + stmt.excluded.prompt_tokens,
+            "completion_tokens": UsageRecord.completion_tokens + stmt.excluded.completion_tokens,
+        },
     )
-    await db.execute(stmt)
\ No newline at end of file
+    await db.execute(stmt)
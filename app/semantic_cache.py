@@ -0,0 +1,247 @@
+import hashlib
+import re
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+import structlog
+
+from app.config import (
+    SEMANTIC_CACHE_EMBEDDER,
+    SEMANTIC_CACHE_DIM,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_MAX_BYTES,
+)
+from app.metrics import SEMANTIC_CACHE_LOOKUPS, SEMANTIC_CACHE_LATENCY
+
+try:
+    import numpy as np
+except ImportError:  # semantic cache is optional: pip install .[semantic]
+    np = None
+
+logger = structlog.get_logger()
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Casefold, drop punctuation and collapse whitespace."""
+    text = _PUNCTUATION.sub(" ", prompt.casefold())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class Embedder(ABC):
+    """Turns a prompt into an L2-normalised float32 vector of size `dim`."""
+
+    dim: int
+
+    @abstractmethod
+    async def embed(self, text: str):
+        pass
+
+
+class HashingEmbedder(Embedder):
+    """Local, network-free embedder: signed feature hashing of character
+    n-grams and words. Robust to whitespace/casing/punctuation changes and
+    small edits, but not to real paraphrases.
+    """
+
+    def __init__(self, dim: int = SEMANTIC_CACHE_DIM, ngram: int = 3):
+        self.dim = dim
+        self.ngram = ngram
+
+    async def embed(self, text: str):
+        text = normalize_prompt(text)
+        padded = f" {text} "
+        features = [padded[i:i + self.ngram] for i in range(len(padded) - self.ngram + 1)]
+        features.extend(text.split())
+
+        vector = np.zeros(self.dim, dtype=np.float32)
+        if not features:
+            return vector
+
+        hashes = np.fromiter(
+            (zlib.crc32(f.encode("utf-8")) for f in features),
+            dtype=np.uint32,
+            count=len(features),
+        )
+        # Top bit picks the sign so collisions tend to cancel out
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+        np.add.at(vector, hashes % self.dim, signs)
+
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class OpenAIEmbedder(Embedder):
+    """Embeddings from the OpenAI API; better on paraphrases, costs a call."""
+
+    def __init__(self, model: str = "text-embedding-3-small", dim: int = SEMANTIC_CACHE_DIM):
+        from openai import AsyncOpenAI
+
+        self.model = model
+        self.dim = dim
+        self.client = AsyncOpenAI()
+
+    async def embed(self, text: str):
+        response = await self.client.embeddings.create(
+            model=self.model,
+            input=normalize_prompt(text),
+            dimensions=self.dim,
+        )
+        vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+# Rows a new VectorIndex starts with
+_INITIAL_CAPACITY = 16
+
+
+EMBEDDERS = {
+    "hashing": HashingEmbedder,
+    "openai": OpenAIEmbedder,
+}
+
+
+class VectorIndex:
+    """Ring of up to `max_entries` (vector, cache_key) with brute-force cosine search.
+
+    Storage starts small and doubles as entries arrive, so the many
+    namespaces that only ever see a handful of prompts stay cheap.
+    """
+
+    def __init__(self, dim: int, max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        capacity = min(_INITIAL_CAPACITY, max_entries)
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._valid = np.zeros(capacity, dtype=bool)
+        self._keys: list[str | None] = [None] * capacity
+        self._slots: dict[str, int] = {}
+        self._next = 0
+        self._size = 0
+
+    @property
+    def size_bytes(self) -> int:
+        return self._vectors.nbytes + self._valid.nbytes
+
+    def add(self, vector, cache_key: str):
+        slot = self._slots.get(cache_key)
+        if slot is None:
+            if self._next == len(self._keys):
+                if len(self._keys) < self.max_entries:
+                    self._grow()
+                else:
+                    self._next = 0
+            slot = self._next
+            self._next += 1
+            self._size = max(self._size, slot + 1)
+            evicted = self._keys[slot]
+            if evicted is not None:
+                del self._slots[evicted]
+        self._vectors[slot] = vector
+        self._valid[slot] = True
+        self._keys[slot] = cache_key
+        self._slots[cache_key] = slot
+
+    def _grow(self):
+        old_capacity = len(self._keys)
+        capacity = min(old_capacity * 2, self.max_entries)
+        vectors = np.zeros((capacity, self._vectors.shape[1]), dtype=np.float32)
+        vectors[:old_capacity] = self._vectors
+        valid = np.zeros(capacity, dtype=bool)
+        valid[:old_capacity] = self._valid
+        self._vectors, self._valid = vectors, valid
+        self._keys.extend([None] * (capacity - old_capacity))
+
+    def search(self, vector) -> tuple[str | None, float]:
+        n = self._size
+        if not self._valid[:n].any():
+            return None, 0.0
+        # Vectors are normalised, so the dot product is the cosine similarity
+        scores = self._vectors[:n] @ vector
+        scores[~self._valid[:n]] = -np.inf
+        best = int(np.argmax(scores))
+        return self._keys[best], float(scores[best])
+
+    def remove(self, cache_key: str):
+        slot = self._slots.pop(cache_key, None)
+        if slot is not None:
+            self._valid[slot] = False
+            self._keys[slot] = None
+
+
+class SemanticCache:
+    """Maps prompts to exact-cache keys of similar earlier prompts.
+
+    One VectorIndex per (tenant, model, params) namespace so that results
+    never cross tenants or generation settings. The index only stores cache
+    keys; the value itself stays in the regular response cache. Total vector
+    memory is capped at `max_bytes` by dropping the least recently used
+    namespaces.
+    """
+
+    def __init__(
+            self,
+            embedder: Embedder,
+            threshold: float = SEMANTIC_CACHE_THRESHOLD,
+            max_bytes: int = SEMANTIC_CACHE_MAX_BYTES,
+    ):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._indexes: OrderedDict[str, VectorIndex] = OrderedDict()
+
+    @staticmethod
+    def namespace(tenant_id: str, model: str, params: dict) -> str:
+        raw = f"{tenant_id}|{model}|{sorted(params.items())}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    async def embed(self, prompt: str):
+        return await self.embedder.embed(prompt)
+
+    def lookup(self, namespace: str, vector) -> str | None:
+        start_time = time.perf_counter()
+        index = self._indexes.get(namespace)
+        cache_key, score = (None, 0.0) if index is None else index.search(vector)
+        SEMANTIC_CACHE_LATENCY.observe(time.perf_counter() - start_time)
+
+        if cache_key is None or score < self.threshold:
+            SEMANTIC_CACHE_LOOKUPS.labels(result="miss").inc()
+            return None
+
+        self._indexes.move_to_end(namespace)
+        SEMANTIC_CACHE_LOOKUPS.labels(result="hit").inc()
+        return cache_key
+
+    def add(self, namespace: str, vector, cache_key: str):
+        index = self._indexes.get(namespace)
+        if index is None:
+            index = VectorIndex(self.embedder.dim)
+            self._indexes[namespace] = index
+            self.size_bytes += index.size_bytes
+        self._indexes.move_to_end(namespace)
+
+        before = index.size_bytes
+        index.add(vector, cache_key)
+        self.size_bytes += index.size_bytes - before
+        # Never evicts the namespace just written to
+        while self.size_bytes > self.max_bytes and len(self._indexes) > 1:
+            _, evicted = self._indexes.popitem(last=False)
+            self.size_bytes -= evicted.size_bytes
+
+    def remove(self, namespace: str, cache_key: str):
+        index = self._indexes.get(namespace)
+        if index is not None:
+            index.remove(cache_key)
+
+
+if np is None:
+    semantic_cache = None
+    logger.warning("semantic_cache_disabled", reason="numpy not installed")
+else:
+    semantic_cache = SemanticCache(EMBEDDERS[SEMANTIC_CACHE_EMBEDDER]())
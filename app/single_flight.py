@@ -0,0 +1,166 @@
+import asyncio
+import time
+import uuid
+
+import structlog
+
+from app.cache import (
+    LOCK_TTL,
+    cache_get,
+    cache_set,
+    encode_cache_value,
+    decode_cache_value,
+    acquire_lock,
+    release_lock,
+    extend_lock,
+)
+from app import deadline
+from app.config import CACHE_READY_CHANNEL, LOCK_WAIT_TIMEOUT_SECONDS
+from app.metrics import CACHE_HITS, COALESCED_REQUESTS, COALESCED_WAIT_LATENCY, LOCK_EXTENSIONS
+from app.redis import redis_client
+
+logger = structlog.get_logger()
+
+# cache_key -> task computing it on this worker
+_inflight: dict[str, asyncio.Task] = {}
+# cache_key -> futures woken when another node finishes (or gives up) the key
+_waiters: dict[str, set[asyncio.Future]] = {}
+
+
+async def run_single_flight(cache_key: str, compute, tenant: str) -> dict:
+    """Run `compute` at most once per cache key across the whole fleet.
+
+    Followers on this worker await the leader's task directly. Followers on
+    other nodes are woken via the CACHE_READY_CHANNEL pub/sub channel as soon
+    as the leader has written the cache, and take over the lock if the
+    leader gives up without a result.
+    """
+    task = _inflight.get(cache_key)
+    if task is not None:
+        COALESCED_REQUESTS.labels(tenant_id=tenant, scope="local").inc()
+        start_time = time.perf_counter()
+        left = deadline.remaining()
+        try:
+            # The leader's result, for as long as this request's deadline allows
+            result = await asyncio.wait_for(asyncio.shield(task), timeout=left if left is None else max(left, 0))
+        except asyncio.TimeoutError:
+            raise deadline.expired("coalesced_wait")
+        COALESCED_WAIT_LATENCY.labels(scope="local").observe(time.perf_counter() - start_time)
+        return {**result, "retries": 0, "fallback_used": False, "cache_hit": True}
+
+    task = asyncio.create_task(_lead_or_follow(cache_key, compute, tenant))
+    _inflight[cache_key] = task
+    task.add_done_callback(lambda t: _forget(cache_key, t))
+    return await asyncio.shield(task)
+
+
+def _forget(cache_key: str, task: asyncio.Task):
+    if _inflight.get(cache_key) is task:
+        del _inflight[cache_key]
+    if not task.cancelled():
+        # Mark the exception as retrieved even if every caller went away
+        task.exception()
+
+
+async def _lead_or_follow(cache_key: str, compute, tenant: str) -> dict:
+    lock_key = f"lock:{cache_key}"
+    token = uuid.uuid4().hex
+    wait_until = time.monotonic() + deadline.budget(LOCK_WAIT_TIMEOUT_SECONDS)
+    start_time = time.perf_counter()
+    waited = False
+
+    while True:
+        waiter = _register_waiter(cache_key)
+        try:
+            if waited:
+                # Registered before reading, so a notification can't slip in between
+                cached = await cache_get(cache_key)
+                if cached:
+                    CACHE_HITS.labels(tenant_id=tenant).inc()
+                    COALESCED_REQUESTS.labels(tenant_id=tenant, scope="remote").inc()
+                    COALESCED_WAIT_LATENCY.labels(scope="remote").observe(time.perf_counter() - start_time)
+                    return {**decode_cache_value(cached), "retries": 0, "fallback_used": False, "cache_hit": True}
+
+            if await acquire_lock(lock_key, token):
+                break
+
+            remaining = wait_until - time.monotonic()
+            if remaining <= 0:
+                # Leader is taking too long; run without the lock rather than fail
+                # (compute itself gives up if the request's deadline has passed)
+                result = await compute()
+                return {**result, "cache_hit": False}
+
+            waited = True
+            try:
+                # Bounded by LOCK_TTL so a crashed leader (no notification) is noticed
+                await asyncio.wait_for(waiter, timeout=min(remaining, LOCK_TTL))
+            except asyncio.TimeoutError:
+                pass
+        finally:
+            _unregister_waiter(cache_key, waiter)
+
+    heartbeat = asyncio.create_task(_keep_lock_alive(lock_key, token))
+    try:
+        result = await compute()
+        await cache_set(cache_key, encode_cache_value(result["output"], result["backend_name"]))
+        return {**result, "cache_hit": False}
+    finally:
+        heartbeat.cancel()
+        await release_lock(lock_key, token)
+        # Wake remote followers whether we succeeded (cache hit) or failed (retry lock)
+        try:
+            await redis_client.publish(CACHE_READY_CHANNEL, cache_key)
+        except Exception as e:
+            logger.warning("cache_ready_publish_failed", error=str(e))
+
+
+async def _keep_lock_alive(lock_key: str, token: str):
+    """Extend the lock while the leader is still generating past LOCK_TTL."""
+    while True:
+        await asyncio.sleep(LOCK_TTL / 3)
+        if not await extend_lock(lock_key, token):
+            return
+        LOCK_EXTENSIONS.inc()
+
+
+def _register_waiter(cache_key: str) -> asyncio.Future:
+    waiter = asyncio.get_running_loop().create_future()
+    _waiters.setdefault(cache_key, set()).add(waiter)
+    return waiter
+
+
+def _unregister_waiter(cache_key: str, waiter: asyncio.Future):
+    waiters = _waiters.get(cache_key)
+    if waiters is None:
+        return
+    waiters.discard(waiter)
+    if not waiters:
+        del _waiters[cache_key]
+
+
+def _notify(cache_key: str):
+    for waiter in _waiters.get(cache_key, ()):
+        if not waiter.done():
+            waiter.set_result(None)
+
+
+async def listen_for_cache_ready():
+    """Background task: wake local followers when any node finishes a key."""
+    while True:
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.subscribe(CACHE_READY_CHANNEL)
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    _notify(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("cache_ready_listener_error", error=str(e))
+            await asyncio.sleep(1)
+        finally:
+            try:
+                await pubsub.reset()
+            except Exception:
+                pass
@@ -0,0 +1,49 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Stage name -> seconds spent, for the request being handled
+_stages: ContextVar[dict[str, float] | None] = ContextVar("request_stages", default=None)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as one stage of the current request (no-op outside one)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages = _stages.get()
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + time.perf_counter() - start
+
+
+class ServerTimingMiddleware:
+    """Report each request's stage timings in a Server-Timing header.
+
+    The header is sent with the response head, so a streaming response
+    only carries the stages finished before its first chunk.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stages: dict[str, float] = {}
+        token = _stages.set(stages)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and stages:
+                stages["total"] = time.perf_counter() - start
+                value = ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in stages.items())
+                message["headers"] = [*message.get("headers", []), (b"server-timing", value.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _stages.reset(token)
@@ -0,0 +1,99 @@
+import asyncio
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import structlog
+from redis.exceptions import ResponseError
+
+from app.backends.base import Usage
+from app.config import USAGE_PERIOD_SECONDS, USAGE_FLUSH_INTERVAL_SECONDS, USAGE_PENDING_KEY
+from app.db import async_session_maker
+from app.metrics import TOKENS_USED, USAGE_FLUSH_LATENCY, USAGE_FLUSH_FAILURES
+from app.redis import redis_client
+from app.repositories import add_usage_records
+
+logger = structlog.get_logger()
+
+_METRICS = ("requests", "prompt_tokens", "completion_tokens")
+
+
+async def record_usage(tenant_id: str, model: str, usage: Usage, requests: int = 1):
+    """Add the usage of `requests` requests to the shared Redis counters.
+
+    Counters live in a single hash, field "<tenant>|<model>|<period>|<metric>",
+    so the flusher can take all of them atomically with one RENAME.
+    """
+    TOKENS_USED.labels(tenant_id=tenant_id, kind="prompt").inc(usage.prompt_tokens)
+    TOKENS_USED.labels(tenant_id=tenant_id, kind="completion").inc(usage.completion_tokens)
+
+    period = int(time.time()) // USAGE_PERIOD_SECONDS * USAGE_PERIOD_SECONDS
+    prefix = f"{tenant_id}|{model}|{period}"
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.hincrby(USAGE_PENDING_KEY, f"{prefix}|requests", requests)
+        pipe.hincrby(USAGE_PENDING_KEY, f"{prefix}|prompt_tokens", usage.prompt_tokens)
+        pipe.hincrby(USAGE_PENDING_KEY, f"{prefix}|completion_tokens", usage.completion_tokens)
+        await pipe.execute()
+
+
+async def flush_usage():
+    """Move pending counters from Redis into usage_records.
+
+    Safe to run on every node at once: RENAME hands the pending hash to
+    exactly one flusher. On a database error the counters are merged back.
+    """
+    flushing_key = f"{USAGE_PENDING_KEY}:flushing:{uuid.uuid4().hex}"
+    try:
+        await redis_client.rename(USAGE_PENDING_KEY, flushing_key)
+    except ResponseError:
+        # No such key: nothing recorded since the last flush
+        return
+
+    counters = await redis_client.hgetall(flushing_key)
+    rows = defaultdict(lambda: dict.fromkeys(_METRICS, 0))
+    for field, value in counters.items():
+        tenant_id, rest = field.split("|", 1)
+        model, period, metric = rest.rsplit("|", 2)
+        rows[(tenant_id, model, int(period))][metric] += int(value)
+
+    start_time = time.perf_counter()
+    try:
+        async with async_session_maker() as db:
+            await add_usage_records(db, [
+                {
+                    "tenant_id": uuid.UUID(tenant_id),
+                    "model": model,
+                    "period_start": datetime.fromtimestamp(period, tz=timezone.utc),
+                    **metrics,
+                }
+                for (tenant_id, model, period), metrics in rows.items()
+            ])
+            await db.commit()
+    except Exception as e:
+        USAGE_FLUSH_FAILURES.inc()
+        logger.warning("usage_flush_failed", rows=len(rows), error=str(e))
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for field, value in counters.items():
+                pipe.hincrby(USAGE_PENDING_KEY, field, int(value))
+            await pipe.execute()
+    finally:
+        USAGE_FLUSH_LATENCY.observe(time.perf_counter() - start_time)
+
+    await redis_client.delete(flushing_key)
+
+
+async def run_usage_flusher(interval: float = USAGE_FLUSH_INTERVAL_SECONDS):
+    """Background task: flush every `interval` seconds, and once more on shutdown."""
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await flush_usage()
+            except Exception as e:
+                logger.warning("usage_flush_failed", error=str(e))
+    finally:
+        try:
+            await flush_usage()
+        except Exception as e:
+            logger.warning("usage_flush_failed", error=str(e))
@@ -0,0 +1 @@
+"""Load-testing suite for the gateway; see bench/load.py."""
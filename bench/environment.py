@@ -0,0 +1,101 @@
+"""
+Hermetic stand-ins for the gateway's dependencies.
+
+`configure` points the gateway at them through environment variables, so
+it must run before anything under app/ is imported:
+
+- Postgres: a SQLite file (aiosqlite) holding tenants, API keys and
+  rate limit policies.
+- Redis: fakeredis in-process, unless a real REDIS_URL is given (e.g. a
+  local redis-server, for realistic round trips).
+- Providers: bench/fake_provider.py behind the "openai" provider, with
+  every model routed to it.
+
+The last_used and usage flushers write with Postgres-only SQL; they run
+off the request path, so they are pushed out of the benchmark window.
+"""
+import json
+import os
+import secrets
+import socket
+import uuid
+
+API_KEY_PEPPER = "bench-pepper"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def configure(workdir: str, provider_url: str, redis_url: str | None = None):
+    routes_path = os.path.join(workdir, "routes.json")
+    with open(routes_path, "w") as f:
+        json.dump({"routes": [{"match": "*", "provider": "openai"}]}, f)
+
+    os.environ.update({
+        "DATABASE_URL": f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}",
+        "API_KEY_PEPPER": API_KEY_PEPPER,
+        "OPENAI_API_KEY": "bench",
+        "BACKEND_ENDPOINTS": json.dumps({"openai": [{"name": "fake", "base_url": provider_url}]}),
+        "ROUTING_CONFIG_PATH": routes_path,
+        "SERVER_TIMING_ENABLED": "true",
+        "LAST_USED_FLUSH_INTERVAL_SECONDS": "3600",
+        "USAGE_FLUSH_INTERVAL_SECONDS": "3600",
+    })
+    if redis_url:
+        os.environ["REDIS_URL"] = redis_url
+    else:
+        os.environ["BENCH_FAKE_REDIS"] = "1"
+
+
+def install_fake_redis():
+    """Swap the gateway's Redis clients for fakeredis ones sharing one server.
+
+    Must run after `configure` and before app modules that bind the
+    clients at import time (everything but app.config and app.redis).
+    """
+    if not os.environ.get("BENCH_FAKE_REDIS"):
+        return
+    import fakeredis
+    import app.redis
+
+    server = fakeredis.FakeServer()
+    app.redis.redis_client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    app.redis.redis_bytes_client = fakeredis.FakeAsyncRedis(server=server)
+
+
+async def seed(tenants: int, requests_per_min: int) -> list[str]:
+    """Create the schema and one tenant + API key each; returns the raw keys."""
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    import app.models  # noqa: F401  registers every table
+    from app.models.api_key import ApiKey, Tenant
+    from app.models.base import Base
+    from app.models.rate_limit_policy import RateLimitPolicy
+    from app.security import hash_api_key
+
+    # SQLite has no gen_random_uuid(); ids come from the Python-side defaults
+    for table in Base.metadata.tables.values():
+        for column in table.columns:
+            if column.server_default is not None and "gen_random_uuid" in str(getattr(column.server_default, "arg", "")):
+                column.server_default = None
+
+    engine = create_async_engine(os.environ["DATABASE_URL"])
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    keys = []
+    async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+        for i in range(tenants):
+            tenant = Tenant(id=uuid.uuid4(), name=f"bench-tenant-{i}")
+            raw_key = f"bench_{secrets.token_urlsafe(24)}"
+            db.add(tenant)
+            db.add(ApiKey(id=uuid.uuid4(), key_hash=hash_api_key(raw_key), tenant_id=tenant.id, name="bench"))
+            db.add(RateLimitPolicy(id=uuid.uuid4(), tenant_id=tenant.id, requests_per_min=requests_per_min))
+            keys.append(raw_key)
+        await db.commit()
+    await engine.dispose()
+    return keys
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+OpenAI-compatible stand-in provider with configurable latency.
+
+Serves /v1/chat/completions (plain and streamed, with a final usage
+chunk when asked for one) after sleeping latency +/- jitter, and answers
+HEAD on /v1/ for connection warm-up.
+
+Usage:
+    python -m bench.fake_provider --port 18081 --latency-ms 50 --jitter-ms 10
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import StreamingResponse
+
+
+def create_app(latency_ms: float, jitter_ms: float, chunks: int) -> FastAPI:
+    app = FastAPI()
+
+    def delay() -> float:
+        return max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000
+
+    @app.api_route("/v1/", methods=["GET", "HEAD"])
+    async def root():
+        return Response()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        prompt = body["messages"][-1]["content"]
+        output = f"echo: {prompt}"
+        usage = {
+            "prompt_tokens": len(prompt) // 4 + 1,
+            "completion_tokens": len(output) // 4 + 1,
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+        if not body.get("stream"):
+            await asyncio.sleep(delay())
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body["model"],
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": output}}],
+                "usage": usage,
+            }
+
+        async def events():
+            # The latency is spread over the chunks, like a generating model
+            step = delay() / chunks
+            size = -(-len(output) // chunks)
+            for i in range(chunks):
+                await asyncio.sleep(step)
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": body["model"],
+                    "choices": [{"index": 0, "delta": {"content": output[i * size:(i + 1) * size]}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            if (body.get("stream_options") or {}).get("include_usage"):
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": body["model"],
+                    "choices": [],
+                    "usage": usage,
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the fake OpenAI-compatible provider")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18081)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--chunks", type=int, default=8, help="Chunks per streamed completion")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency_ms, args.jitter_ms, args.chunks), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Load-test the gateway end to end against hermetic stand-ins.
+
+Replays a workload file (JSON lines: prompt, model, stream, max_tokens)
+at a fixed concurrency, mixing in repeats of earlier prompts to hit a
+target cache-hit ratio and spreading requests over tenants by weight.
+The report gives throughput, latency percentiles, the observed cache-hit
+ratio, per-tenant latency and a per-stage breakdown taken from the
+gateway's Server-Timing header (stages nest: queue_wait is inside
+inference).
+
+Modes:
+    inprocess  drive the ASGI app directly; no sockets on the client side
+    uvicorn    run the gateway under uvicorn in a subprocess (set --redis-url
+               to a local redis-server for real Redis round trips)
+
+Usage:
+    python -m bench.load --requests 2000 --concurrency 64 --cache-hit-ratio 0.3
+    python -m bench.load --mode uvicorn --tenant-weights 8,1,1 --output report.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+import httpx
+
+from bench import environment
+
+DEFAULT_WORKLOAD = os.path.join(os.path.dirname(__file__), "workloads", "sample.jsonl")
+
+
+def load_workload(path: str) -> list[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def build_schedule(items: list[dict], total: int, cache_hit_ratio: float, tenant_weights: list[float], rng: random.Random) -> list[tuple[int, dict]]:
+    """(tenant index, request body) pairs, fixed up front by the seed.
+
+    Cache keys are per tenant, so a repeat is drawn from what the same
+    tenant already sent; fresh requests get a unique suffix so they miss.
+    """
+    sent = defaultdict(list)
+    schedule = []
+    for i in range(total):
+        tenant = rng.choices(range(len(tenant_weights)), weights=tenant_weights)[0]
+        if sent[tenant] and rng.random() < cache_hit_ratio:
+            body = rng.choice(sent[tenant])
+        else:
+            item = items[i % len(items)]
+            body = {
+                "prompt": f"{item['prompt']} [{i}]",
+                "model": item.get("model", "gpt-4o-mini"),
+                "max_tokens": item.get("max_tokens", 100),
+                "stream": item.get("stream", False),
+            }
+            sent[tenant].append(body)
+        schedule.append((tenant, body))
+    return schedule
+
+
+def parse_server_timing(header: str | None) -> dict[str, float]:
+    stages = {}
+    for entry in (header or "").split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur":
+                stages[name] = float(value)
+    return stages
+
+
+async def send(client: httpx.AsyncClient, api_key: str, body: dict) -> dict:
+    headers = {"Authorization": f"Bearer {api_key}"}
+    payload = {k: v for k, v in body.items() if k != "stream"}
+    start = time.perf_counter()
+    first_byte = None
+    cache_hit = False
+
+    if body["stream"]:
+        async with client.stream("POST", "/v1/predict/stream", json=payload, headers=headers) as response:
+            event = None
+            async for line in response.aiter_lines():
+                if first_byte is None:
+                    first_byte = time.perf_counter()
+                if line.startswith("event:"):
+                    event = line.removeprefix("event:").strip()
+                elif line.startswith("data:") and event == "done":
+                    cache_hit = json.loads(line.removeprefix("data:"))["cache_hit"]
+    else:
+        response = await client.post("/v1/predict", json=payload, headers=headers)
+        if response.status_code == 200:
+            cache_hit = response.json()["cache_hit"]
+
+    end = time.perf_counter()
+    return {
+        "status": response.status_code,
+        "latency_ms": (end - start) * 1000,
+        "ttfb_ms": ((first_byte or end) - start) * 1000,
+        "cache_hit": cache_hit,
+        "stages": parse_server_timing(response.headers.get("server-timing")),
+    }
+
+
+async def run_load(client: httpx.AsyncClient, api_keys: list[str], schedule: list[tuple[int, dict]], concurrency: int) -> tuple[list[dict], float]:
+    results = [None] * len(schedule)
+    position = iter(range(len(schedule)))
+
+    async def worker():
+        for i in position:
+            tenant, body = schedule[i]
+            try:
+                result = await send(client, api_keys[tenant], body)
+            except httpx.HTTPError as e:
+                result = {"status": type(e).__name__, "latency_ms": None, "cache_hit": False, "stages": {}}
+            result["tenant"] = tenant
+            results[i] = result
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results, time.perf_counter() - start
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))], 3)
+
+    return {
+        "mean": round(statistics.fmean(ordered), 3),
+        "p50": pct(50),
+        "p95": pct(95),
+        "p99": pct(99),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def summarize(results: list[dict], duration: float) -> dict:
+    ok = [r for r in results if r["status"] == 200]
+    stages = defaultdict(list)
+    for r in ok:
+        for name, ms in r["stages"].items():
+            stages[name].append(ms)
+    by_tenant = defaultdict(list)
+    for r in ok:
+        by_tenant[r["tenant"]].append(r["latency_ms"])
+
+    return {
+        "requests": len(results),
+        "errors": dict(Counter(str(r["status"]) for r in results if r["status"] != 200)),
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(ok) / duration, 1) if duration else 0.0,
+        "latency_ms": percentiles([r["latency_ms"] for r in ok]),
+        "ttfb_ms": percentiles([r["ttfb_ms"] for r in ok]),
+        "cache_hit_ratio": round(sum(r["cache_hit"] for r in ok) / len(ok), 3) if ok else 0.0,
+        "stages_ms": {name: percentiles(values) for name, values in sorted(stages.items())},
+        "tenants": {
+            str(tenant): {"requests": len(values), "latency_ms": percentiles(values)}
+            for tenant, values in sorted(by_tenant.items())
+        },
+    }
+
+
+async def wait_until_up(url: str, timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+                await asyncio.sleep(0.1)
+
+
+async def main(args):
+    tenant_weights = [float(w) for w in args.tenant_weights.split(",")] if args.tenant_weights else [1.0] * args.tenants
+    rng = random.Random(args.seed)
+    schedule = build_schedule(load_workload(args.workload), args.warmup + args.requests, args.cache_hit_ratio, tenant_weights, rng)
+    warmup, measured = schedule[:args.warmup], schedule[args.warmup:]
+
+    processes = []
+    with tempfile.TemporaryDirectory(prefix="aigw-bench-") as workdir:
+        try:
+            provider_port = environment.free_port()
+            processes.append(subprocess.Popen([
+                sys.executable, "-m", "bench.fake_provider",
+                "--port", str(provider_port),
+                "--latency-ms", str(args.provider_latency_ms),
+                "--jitter-ms", str(args.provider_jitter_ms),
+            ]))
+            provider_url = f"http://127.0.0.1:{provider_port}/v1"
+            await wait_until_up(provider_url + "/")
+
+            environment.configure(workdir, provider_url, args.redis_url)
+            api_keys = await environment.seed(len(tenant_weights), requests_per_min=10_000_000)
+
+            if args.mode == "uvicorn":
+                port = environment.free_port()
+                processes.append(subprocess.Popen([sys.executable, "-m", "bench.serve", "--port", str(port)]))
+                base_url = f"http://127.0.0.1:{port}"
+                await wait_until_up(base_url + "/healthz")
+                limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+                async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+                    await run_load(client, api_keys, warmup, args.concurrency)
+                    results, duration = await run_load(client, api_keys, measured, args.concurrency)
+            else:
+                environment.install_fake_redis()
+                from app.main import app
+
+                async with app.router.lifespan_context(app):
+                    transport = httpx.ASGITransport(app=app)
+                    async with httpx.AsyncClient(transport=transport, base_url="http://gateway", timeout=60) as client:
+                        await run_load(client, api_keys, warmup, args.concurrency)
+                        results, duration = await run_load(client, api_keys, measured, args.concurrency)
+        finally:
+            for process in processes:
+                process.terminate()
+                process.wait()
+
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        **summarize(results, duration),
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the gateway against stand-in dependencies")
+    parser.add_argument("--workload", default=DEFAULT_WORKLOAD, help="JSON-lines file of requests")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=1000, help="Measured requests")
+    parser.add_argument("--warmup", type=int, default=100, help="Requests sent before measuring")
+    parser.add_argument("--cache-hit-ratio", type=float, default=0.2, help="Share of requests repeating an earlier prompt")
+    parser.add_argument("--tenants", type=int, default=4)
+    parser.add_argument("--tenant-weights", default="", help="Comma-separated traffic share per tenant; overrides --tenants")
+    parser.add_argument("--provider-latency-ms", type=float, default=50)
+    parser.add_argument("--provider-jitter-ms", type=float, default=10)
+    parser.add_argument("--redis-url", default=None, help="Use a real Redis instead of fakeredis")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Also write the JSON report here")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+Run the gateway under uvicorn against the stand-ins set up by bench.load.
+
+Reads its configuration from the environment written by
+bench.environment.configure; not meant to be started by hand.
+
+Usage:
+    python -m bench.serve --port 18080
+"""
+import argparse
+
+import uvicorn
+
+from bench import environment
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the gateway for benchmarking")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080)
+    args = parser.parse_args()
+
+    environment.install_fake_redis()
+    from app.main import app
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False)
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Deactivate an API key and broadcast the revocation so every gateway node
+drops it from its in-process auth cache immediately.
+
+Usage:
+    python scripts/revoke_api_key.py <raw_api_key>
+"""
+import argparse
+import asyncio
+import os
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.auth_cache import publish_invalidation
+from app.repositories import deactivate_api_key
+from app.security import hash_api_key
+from app.settings import settings
+
+async def main(raw_key: str):
+    db_url = os.getenv("DATABASE_URL", settings.database_url)
+    engine = create_async_engine(db_url, pool_pre_ping=True)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    key_hash = hash_api_key(raw_key)
+
+    async with Session() as db:
+        revoked = await deactivate_api_key(db, key_hash)
+        await db.commit()
+
+    await engine.dispose()
+
+    if not revoked:
+        print("No active API key matches the given value.")
+        return
+
+    await publish_invalidation(key_hash)
+    print("API key revoked.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Revoke an API key")
+    parser.add_argument("api_key", type=str, help="The raw API key to revoke")
+    args = parser.parse_args()
+    asyncio.run(main(args.api_key))
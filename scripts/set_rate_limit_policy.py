@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Create or update the rate limit policy of a tenant or an API key, then tell
+every gateway node to reload its policy cache.
+
+Usage:
+    python scripts/set_rate_limit_policy.py --tenant-id <uuid> --rpm 600 --burst 100 --tpm 200000 --weight 2
+    python scripts/set_rate_limit_policy.py --api-key-id <uuid> --rpm 60 --max-concurrency 4 --mode local
+"""
+import argparse
+import asyncio
+import os
+import uuid
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.policies import publish_policy_change
+from app.repositories import upsert_rate_limit_policy
+from app.settings import settings
+
+async def main(args):
+    db_url = os.getenv("DATABASE_URL", settings.database_url)
+    engine = create_async_engine(db_url, pool_pre_ping=True)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+
+    async with Session() as db:
+        policy = await upsert_rate_limit_policy(
+            db,
+            tenant_id=args.tenant_id,
+            api_key_id=args.api_key_id,
+            requests_per_min=args.rpm,
+            burst=args.burst,
+            max_concurrency=args.max_concurrency,
+            mode=args.mode,
+            tokens_per_min=args.tpm,
+            scheduling_weight=args.weight,
+        )
+        await db.commit()
+
+    await engine.dispose()
+    await publish_policy_change()
+    print(f"Policy {policy.id} saved.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Set a rate limit policy")
+    subject = parser.add_mutually_exclusive_group(required=True)
+    subject.add_argument("--tenant-id", type=uuid.UUID)
+    subject.add_argument("--api-key-id", type=uuid.UUID)
+    parser.add_argument("--rpm", type=int, required=True, help="Requests per minute")
+    parser.add_argument("--burst", type=int, default=None, help="Token bucket capacity")
+    parser.add_argument("--max-concurrency", type=int, default=None)
+    parser.add_argument("--mode", choices=["strict", "local"], default=None)
+    parser.add_argument("--tpm", type=int, default=None, help="Tokens per minute (tenant policies only)")
+    parser.add_argument("--weight", type=float, default=None, help="Scheduling weight under provider contention (tenant policies only)")
+    asyncio.run(main(parser.parse_args()))